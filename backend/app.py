@@ -1,29 +1,47 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, request, jsonify, send_file, send_from_directory, Response
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity, verify_jwt_in_request
 import torch
-from PIL import Image
 import io
 import os
 import numpy as np
-from torchvision import transforms
 from datetime import timedelta
-import uuid
-from torch import serialization as torch_serialization
+import json
+import shutil
+import tempfile
+import atexit
+import base64
+import mimetypes
+from collections import namedtuple
 from models.ganstego import (
-    AdvancedGenerator, 
-    AdvancedDecoder, 
-    AdvancedDiscriminator,
+    fit_text,
     text_to_bits,
     bits_to_text
 )
+from models.loader import load_models, checkpoint_hash
+from models.quantization import planned_quantize_mode, quantize_from_env
+from models.compiled import load_cached_models, load_compiled_models
+from models.onnx_backend import load_onnx_models
+from models.message_cache import MessageProjectionCache, load_watermark_messages
+from inference import BatchScheduler
+from archives import collect_uploads, iter_archive_images
+from preprocessing import to_model_batch, from_model_batch, batch_buffer
+from image_pool import ImagePool, OUTPUT_FORMAT, OUTPUT_FORMATS
+from metrics import image_metrics, bit_diagnostics, BitErrorTracker
+from write_behind import WriteBehindStore
+from content_store import ContentStore
+from result_cache import ResultCache, model_version
+from embedding import (TILE_CHARS, split_tiles, stitch_tiles, split_message, message_bits,
+                       join_message, run_tiles, downsample_cover, add_residual)
 
 app = Flask(__name__)
 # Allow frontend at localhost:3000 by default; adjust as needed
 CORS(app, resources={r"*": {"origins": "*"}})
 
 # Initialize SQLAlchemy if available
-from db_models import db, User, ProcessingHistory
+from db_models import db, User, ProcessingHistory, BatchJob, UserPreference
+from jobs import submit_job, job_to_dict, fail_interrupted_jobs, JobQueueFull
+import deferred_metrics
 from dotenv import load_dotenv
 import os
 load_dotenv()
@@ -60,136 +78,397 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URI', 'sqlite:///ste
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS', 'False') == 'True'
 db.init_app(app)
 
+# Ensure the DB exists and fail jobs a previous process left queued/running. This
+# runs on import so it also happens under `flask run` and WSGI servers; with
+# several worker processes load the app once (e.g. gunicorn --preload) so one
+# worker's startup cannot fail another's live jobs
+with app.app_context():
+    db.create_all()
+    fail_interrupted_jobs()
+
 # Model initialization
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 message_len = 256
 
-# Initialize models
-generator = AdvancedGenerator(message_len).to(device)
-decoder = AdvancedDecoder(message_len).to(device)
-discriminator = AdvancedDiscriminator().to(device)
-
 # Ensure instance and upload directories exist
 INSTANCE_DIR = os.path.join(os.path.dirname(__file__), 'instance')
 UPLOAD_DIR = os.path.join(INSTANCE_DIR, 'uploads')
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# Allowlist numpy scalar for safe torch.load when weights_only=True
-try:
-    torch_serialization.add_safe_globals([np._core.multiarray.scalar, np.dtype])
-except Exception:
-    pass
-
-# Load the saved model
-model_path = os.path.join(os.path.dirname(__file__), 'models', 'final_ganstego.pth')
-if os.path.exists(model_path):
-    try:
-        print("[Startup] Loading model checkpoint...", flush=True)
-        # Fallback to legacy load for this checkpoint
-        checkpoint = torch.load(model_path, map_location=device, weights_only=False)
-        print("[Startup] Checkpoint loaded, applying state dicts...", flush=True)
-        if isinstance(checkpoint, dict):
-            generator.load_state_dict(checkpoint['generator'])
-            decoder.load_state_dict(checkpoint['decoder'])
-            discriminator.load_state_dict(checkpoint['discriminator'])
-        else:
-            print("Model format is different, trying direct load...")
-            if hasattr(checkpoint, 'generator'):
-                generator = checkpoint.generator
-            if hasattr(checkpoint, 'decoder'):
-                decoder = checkpoint.decoder
-            if hasattr(checkpoint, 'discriminator'):
-                discriminator = checkpoint.discriminator
-        print("Model loaded successfully!", flush=True)
-    except Exception as e:
-        print(f"Warning: Error loading model: {str(e)}", flush=True)
+# Decoding uploads and encoding PNGs (IMAGE_POOL=thread|process, IMAGE_POOL_WORKERS).
+# Created before the models load so process workers fork from a single-threaded parent
+image_pool = ImagePool()
+
+# Saved images are encoded and written in the background; /uploads serves them
+# from memory until they reach disk (UPLOAD_BUFFER_MB bounds what is held)
+upload_store = WriteBehindStore(UPLOAD_DIR, image_pool)
+atexit.register(upload_store.flush)
+# Images are stored once per content hash; history deletes release unreferenced blobs
+content_store = ContentStore(UPLOAD_DIR, upload_store)
+app.extensions['content_store'] = content_store
+
+# Hash the checkpoint once; it keys the compiled artifacts and the result cache
+CHECKPOINT_HASH = checkpoint_hash()
+
+# Optionally serve cached TorchScript or ONNX Runtime artifacts instead of the eager modules.
+# TorchScript artifacts already in the cache are loaded without building the eager models
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'eager').lower()
+cached_models = None
+if MODEL_BACKEND == 'torchscript':
+    QUANTIZE_APPLIED = planned_quantize_mode(device)
+    cached_models = load_cached_models(CHECKPOINT_HASH, device, QUANTIZE_APPLIED)
+if cached_models is not None:
+    generator, decoder, discriminator = cached_models
+    print("[Startup] Serving cached TorchScript models", flush=True)
 else:
-    print(f"Warning: Model file {model_path} not found!", flush=True)
-
-# Set models to evaluation mode
-generator.eval()
-decoder.eval()
-discriminator.eval()
-
-# Image transformations
-transform = transforms.Compose([
-    transforms.Resize((96, 96)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.5, 0.5, 0.5], std=[0.5, 0.5, 0.5])
-])
-
-# ===== IMAGE QUALITY METRICS =====
-def calculate_psnr(img1, img2):
-    """Calculate Peak Signal-to-Noise Ratio between two images"""
-    mse = np.mean((img1 - img2) ** 2)
-    if mse == 0:
-        return 100.0
-    max_pixel = 255.0
-    psnr = 20 * np.log10(max_pixel / np.sqrt(mse))
-    return round(psnr, 2)
-
-def calculate_ssim(img1, img2):
-    """Calculate Structural Similarity Index between two images"""
-    # Convert to grayscale if needed
-    if len(img1.shape) == 3:
-        img1_gray = np.mean(img1, axis=2)
-        img2_gray = np.mean(img2, axis=2)
+    # Load the saved model
+    generator, decoder, discriminator = load_models(device, message_len)
+
+    # Optionally serve INT8 copies of the decoder and discriminator (QUANTIZE_MODELS=dynamic|static);
+    # QUANTIZE_APPLIED is the mode actually served and keys the artifacts and the result cache
+    decoder, discriminator, QUANTIZE_APPLIED = quantize_from_env(decoder, discriminator)
+
+    if MODEL_BACKEND == 'torchscript':
+        generator, decoder, discriminator = load_compiled_models(
+            generator, decoder, discriminator, device, variant=QUANTIZE_APPLIED, ckpt_hash=CHECKPOINT_HASH)
+    elif MODEL_BACKEND == 'onnx':
+        generator, decoder, discriminator = load_onnx_models(
+            generator, decoder, discriminator, variant=QUANTIZE_APPLIED, ckpt_hash=CHECKPOINT_HASH)
+
+# ===== BATCHED INFERENCE =====
+# Projected message maps for repeated messages (eager generator only; traced/ONNX
+# generators take the raw message bits)
+message_cache = MessageProjectionCache(generator) if hasattr(generator, 'embed') else None
+if message_cache is not None:
+    watermarks = [fit_text(m, 32) for m in load_watermark_messages()]
+    message_cache.register(watermarks, list(text_to_bits(watermarks, 32).to(device)))
+
+# Responses for repeated identical requests, keyed per checkpoint/backend/quantization
+result_cache = ResultCache(model_version(CHECKPOINT_HASH, MODEL_BACKEND, QUANTIZE_APPLIED))
+
+# One hide request: 96x96 uint8 cover, message bits and text, whether to compute
+# image_metrics with the batch (`score`) and whether to decode the stego (`decode`)
+HideItem = namedtuple('HideItem', 'image bits text score decode')
+
+def _hide_batch(items):
+    """Embed a batch of HideItems.
+
+    Returns (uint8 stego array, decoded bits, metrics) per item. Only items with
+    `decode` set go through the decoder (their bits give the BER), and the
+    image_metrics of items with `score` set are computed for the whole batch in
+    one call; both are None for the other items.
+    """
+    images = to_model_batch([item.image for item in items], device, out=batch_buffer(len(items), device=device))
+    messages = torch.stack([item.bits for item in items]).to(device)
+    decode = [i for i, item in enumerate(items) if item.decode]
+    decoded = [None] * len(items)
+    with torch.no_grad():
+        if message_cache is not None:
+            msg_maps = message_cache.get_many([item.text for item in items], messages)
+            stego = generator.embed(images, msg_maps)
+        else:
+            stego = generator(images, messages)
+        if decode:
+            for i, bits in zip(decode, decoder(stego[decode]).cpu()):
+                decoded[i] = bits
+    stego_arrays = from_model_batch(stego)
+    scored = [i for i, item in enumerate(items) if item.score]
+    metrics = [None] * len(items)
+    if scored:
+        covers = np.stack([items[i].image for i in scored])
+        for i, result in zip(scored, image_metrics(covers, stego_arrays[scored])):
+            metrics[i] = result
+    return list(zip(stego_arrays, decoded, metrics))
+
+def _analyze_batch(images):
+    """Run the discriminator over a batch of images and return P(cover) per image"""
+    batch = to_model_batch(images, device, out=batch_buffer(len(images), device=device))
+    with torch.no_grad():
+        probs = torch.sigmoid(discriminator(batch)).view(-1)
+    return probs.cpu().tolist()
+
+def _extract_batch(images):
+    """Decoder bit probabilities for a batch of images (round them to get the bits)"""
+    batch = to_model_batch(images, device, out=batch_buffer(len(images), device=device))
+    with torch.no_grad():
+        decoded = decoder(batch)
+    return list(decoded.cpu())
+
+# Concurrent requests are queued here and run as one batched forward pass
+hide_scheduler = BatchScheduler(_hide_batch, name='hide')
+extract_scheduler = BatchScheduler(_extract_batch, name='extract')
+analyze_scheduler = BatchScheduler(_analyze_batch, name='analyze')
+
+# Batch endpoints: upload limits and image decoding pool
+MAX_BATCH_ITEMS = int(os.getenv('MAX_BATCH_ITEMS', '1000'))
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '64'))
+JOB_CHUNK_SIZE = int(os.getenv('JOB_CHUNK_SIZE', '64'))
+
+# Images hide persists unless the request says otherwise (save=stego,cover|stego|cover|none)
+SAVE_ARTIFACTS = frozenset(a.strip() for a in os.getenv('SAVE_ARTIFACTS', 'stego,cover').lower().split(',')
+                           if a.strip() in ('stego', 'cover'))
+
+# Hide modes: 96x96 thumbnail, full-resolution tiles, or a 96x96 residual upsampled onto the cover
+HIDE_MODES = ('thumbnail', 'tiled', 'residual')
+
+# Hide response metrics: full (PSNR, SSIM, MS-SSIM, BER, stats), fast (no SSIM), none,
+# or deferred (none in the response, computed in the background into the history row)
+METRICS_MODES = ('full', 'fast', 'none', 'deferred')
+HIDE_METRICS = os.getenv('HIDE_METRICS', 'full').lower()
+if HIDE_METRICS not in METRICS_MODES:
+    raise ValueError(f"HIDE_METRICS must be one of {', '.join(METRICS_MODES)}")
+
+# Per-bit-position error rates of every message embedded by hide (see /inference/bits)
+bit_tracker = BitErrorTracker()
+
+@app.route('/inference/stats', methods=['GET'])
+def inference_stats():
+    """Queue depth, batch size and wait time for each inference queue, plus cache and upload counters"""
+    return jsonify({
+        'hide': hide_scheduler.stats(),
+        'extract': extract_scheduler.stats(),
+        'analyze': analyze_scheduler.stats(),
+        'message_cache': message_cache.stats() if message_cache is not None else None,
+        'uploads': dict(upload_store.stats(), **content_store.stats()),
+        'result_cache': result_cache.stats(),
+        'deferred_metrics': deferred_metrics.stats()
+    })
+
+@app.route('/inference/bits', methods=['GET'])
+def inference_bits():
+    """Error rate and soft-decision margin per message bit position over all hides since startup"""
+    return jsonify(bit_tracker.stats())
+
+# Static serving for uploaded files (must be defined at import time)
+@app.route('/uploads/<path:filename>')
+def uploaded_file(filename):
+    pending = upload_store.get(filename)
+    if pending is not None:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return send_file(io.BytesIO(pending), mimetype=mimetype, download_name=os.path.basename(filename))
+    return send_from_directory(UPLOAD_DIR, filename)
+
+def _verify_stego(mode, stego_array, message, message_tensor):
+    """Decode the uint8 stego image exactly as /steganography/extract sees the saved PNG.
+
+    Returns the recovered text and per-bit confidence (|p - 0.5| * 2) for the
+    bits that carry the message.
+    """
+    if mode == 'tiled':
+        probs = torch.stack(run_tiles(extract_scheduler, list(split_tiles(stego_array))))
+        recovered = join_message(probs)
+        used = max(1, -(-len(message.encode('utf-8')) // TILE_CHARS))  # tiles carrying the message
+        probs, message_tensor = probs[:used], message_tensor[:used]
     else:
-        img1_gray = img1
-        img2_gray = img2
-    
-    # Constants for SSIM
-    C1 = (0.01 * 255) ** 2
-    C2 = (0.03 * 255) ** 2
-    
-    # Calculate means
-    mu1 = np.mean(img1_gray)
-    mu2 = np.mean(img2_gray)
-    
-    # Calculate variances and covariance
-    sigma1_sq = np.var(img1_gray)
-    sigma2_sq = np.var(img2_gray)
-    sigma12 = np.cov(img1_gray.flatten(), img2_gray.flatten())[0, 1]
-    
-    # SSIM formula
-    ssim = ((2 * mu1 * mu2 + C1) * (2 * sigma12 + C2)) / \
-           ((mu1**2 + mu2**2 + C1) * (sigma1_sq + sigma2_sq + C2))
-    
-    return round(ssim, 4)
-
-def calculate_ber(original_bits, extracted_bits):
-    """Calculate Bit Error Rate between original and extracted bits"""
-    if len(original_bits) != len(extracted_bits):
-        return 1.0
-    
-    errors = sum(o != e for o, e in zip(original_bits, extracted_bits))
-    ber = errors / len(original_bits)
-    return round(ber, 6)
-
-def get_image_stats(image_array):
-    """Get basic statistics about an image"""
+        # PNG is lossless, so the saved file decodes back to stego_array
+        model_input = downsample_cover(stego_array) if mode == 'residual' else stego_array
+        probs = extract_scheduler.run(model_input).unsqueeze(0)
+        recovered = bits_to_text(probs[0])
+    diagnostics = bit_diagnostics(message_tensor.reshape(1, -1), probs.reshape(1, -1))
+    errors = int(diagnostics['errors'].sum().item())
+    confidence = diagnostics['margins'][0]
     return {
-        'mean': round(float(np.mean(image_array)), 2),
-        'std': round(float(np.std(image_array)), 2),
-        'min': round(float(np.min(image_array)), 2),
-        'max': round(float(np.max(image_array)), 2)
+        'message': recovered,
+        'verified': recovered == message,
+        'bit_errors': errors,
+        'ber': round(diagnostics['ber'].item(), 6),
+        'mean_confidence': round(confidence.mean().item(), 4),
+        'min_confidence': round(confidence.min().item(), 4),
+        'bit_confidence': [round(c, 4) for c in confidence.tolist()]
     }
 
-def preprocess_image(image):
-    return transform(image)
+def _request_format():
+    """Output format requested with the `format` form field, or None; raises ValueError if unknown"""
+    fmt = (request.form.get('format') or '').lower()
+    if not fmt:
+        return None
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(OUTPUT_FORMATS)}")
+    return fmt
+
+def _request_metrics(modes=METRICS_MODES):
+    """Metrics mode from the `metrics` form field (default HIDE_METRICS, or full where
+    that is not allowed); raises ValueError if not in `modes`"""
+    metrics = (request.form.get('metrics') or '').lower()
+    if not metrics:
+        return HIDE_METRICS if HIDE_METRICS in modes else 'full'
+    if metrics not in modes:
+        raise ValueError(f"Unknown metrics '{metrics}', expected one of {', '.join(modes)}")
+    return metrics
+
+def _preferred_format(user_id):
+    """The user's UserPreference.preferred_image_format if it is a known output format, else OUTPUT_FORMAT"""
+    if user_id:
+        pref = UserPreference.query.filter_by(user_id=user_id).first()
+        fmt = ((pref.preferred_image_format if pref else None) or '').lower()
+        if fmt in OUTPUT_FORMATS:
+            return fmt
+    return OUTPUT_FORMAT
+
+def _output_options(user_id):
+    """(format, artifacts to persist) for a hide request; raises ValueError on bad fields"""
+    fmt = _request_format() or _preferred_format(user_id)
+    save = request.form.get('save')
+    if save is None:
+        return fmt, SAVE_ARTIFACTS
+    artifacts = {a.strip() for a in save.lower().split(',') if a.strip()} - {'none'}
+    if not artifacts <= {'stego', 'cover'}:
+        raise ValueError("save must be a comma-separated list of stego, cover (or none)")
+    return fmt, frozenset(artifacts)
+
+def _score_hide(cover_array, stego_array, message_tensor, extracted_bits_tensor, quality=None, with_ssim=True):
+    """Metric sections of a hide response: cover/stego metrics, image stats and model performance.
+
+    `quality` is a precomputed image_metrics result; without `with_ssim` the
+    SSIM fields are None.
+    """
+    # STEGO quality metrics and image statistics in one fused pass
+    if quality is None:
+        quality = image_metrics(cover_array, stego_array, with_ssim)[0]
+    stego_psnr, stego_ssim, stego_ms_ssim = quality['psnr'], quality['ssim'], quality['ms_ssim']
+
+    # BER and soft-decision margins of the decoded message (one row of bits per tile)
+    diagnostics = bit_tracker.update(message_tensor.reshape(-1, 256), extracted_bits_tensor.reshape(-1, 256))
+    stego_ber = round(diagnostics['errors'].float().mean().item(), 6)
+    bit_margin = round(diagnostics['margin'].mean().item(), 4)
+    min_bit_margin = round(diagnostics['min_margin'].min().item(), 4)
 
-def postprocess_image(tensor):
-    # Denormalize and convert to PIL Image
-    tensor = tensor * 0.5 + 0.5
-    tensor = tensor.squeeze(0).permute(1, 2, 0)
-    tensor = tensor.detach().cpu().numpy()
-    tensor = np.clip(tensor * 255, 0, 255).astype(np.uint8)
-    return Image.fromarray(tensor)
+    return {
+        # COVER image metrics (comparing to itself - perfect values)
+        'cover_metrics': {
+            'psnr': 100.0,
+            'ssim': 1.0,
+            'ber': 0.0
+        },
+        'stego_metrics': {
+            'psnr': float(stego_psnr),
+            'ssim': stego_ssim,
+            'ms_ssim': stego_ms_ssim,
+            'ber': float(stego_ber),
+            'bit_margin': float(bit_margin),
+            'min_bit_margin': float(min_bit_margin)
+        },
+        'cover_stats': quality['cover_stats'],
+        'stego_stats': quality['stego_stats'],
+        'model_performance': {
+            'quality_score': round((stego_psnr / 50) * 100, 2),
+            'similarity_score': round(stego_ssim * 100, 2) if stego_ssim is not None else None,
+            'embedding_accuracy': round((1 - stego_ber) * 100, 2)
+        }
+    }
 
-# Static serving for uploaded files (must be defined at import time)
-@app.route('/uploads/<path:filename>')
-def uploaded_file(filename):
-    return send_from_directory(UPLOAD_DIR, filename)
+def _hide_response(cover_data, mode, raw_message, verify=False, fmt=OUTPUT_FORMAT, artifacts=SAVE_ARTIFACTS,
+                   metrics='full'):
+    """Embed a message into an uploaded cover and build the hide response.
+
+    With `verify` the saved stego image is decoded again and the response gets
+    a `verification` block, so clients need not re-upload it to extract.
+    Images are stored in `fmt`; a stego image not in `artifacts` is returned
+    inline as a data URL instead, and an unsaved cover has no URL.
+    `metrics` (full|fast|none|deferred) selects the metric sections; fast skips
+    SSIM and none/deferred leave them out.
+    Returns (response, deferred) where `deferred` computes the stego metrics
+    later for metrics=deferred and is None otherwise.
+    Raises ValueError when the message does not fit the cover (tiled mode).
+    """
+    mode_info = {}
+    quality = None
+    # Only full/fast decode the stego on the request path; deferred decodes it in the background
+    scored = metrics in ('full', 'fast')
+
+    if mode == 'tiled':
+        # Full-resolution cover cut into 96x96 tiles, one 32-byte slice of the message per tile
+        message = raw_message
+        cover_array = image_pool.decode_full(cover_data)
+        tiles = split_tiles(cover_array)
+        chunks = split_message(message, len(tiles))
+        cover_url = content_store.put_upload(cover_data, fmt) if 'cover' in artifacts else None
+        print(f"[HIDE_MESSAGE] Saving cover image to: {cover_url}")
+        tile_bits = message_bits(chunks)
+
+        # All tiles embedded together (in groups of TILE_BATCH_SIZE per forward pass)
+        results = run_tiles(hide_scheduler, [HideItem(t, bits, chunk, score=False, decode=scored)
+                                             for t, bits, chunk in zip(tiles, tile_bits, chunks)])
+        stego_tiles = np.stack([stego for stego, _, _ in results])
+        stego_array = stitch_tiles(cover_array, stego_tiles)
+        message_tensor = tile_bits
+        extracted_bits_tensor = torch.stack([decoded for _, decoded, _ in results]) if scored else None
+        mode_info = {'tiles': len(tiles), 'capacity': len(tiles) * TILE_CHARS}
+    elif mode == 'residual':
+        # One 96x96 forward pass; the residual is upsampled onto the full-resolution cover
+        message = fit_text(raw_message, 32)
+        cover_array = image_pool.decode_full(cover_data)
+        cover_url = content_store.put_upload(cover_data, fmt) if 'cover' in artifacts else None
+        print(f"[HIDE_MESSAGE] Saving cover image to: {cover_url}")
+        model_cover = downsample_cover(cover_array)
+        message_tensor = text_to_bits(message, 32)
+        # The decoder runs on the reduced full-size stego below, not on the model output
+        model_stego, _, _ = hide_scheduler.run(
+            HideItem(model_cover, message_tensor, message, score=False, decode=False))
+        stego_array = add_residual(cover_array, model_cover, model_stego)
+        # BER of what extract will actually see: the full-size stego reduced back to 96x96
+        # (left to the background worker for metrics=deferred)
+        extracted_bits_tensor = extract_scheduler.run(downsample_cover(stego_array)) if scored else None
+    else:
+        message = fit_text(raw_message, 32)  # Ensure message is 32 bytes of UTF-8
+
+        # Reduced 96x96 cover (model input and metrics) first, so the model input
+        # is not queued behind the full-resolution cover encode on the image pool
+        cover_array = image_pool.decode(cover_data)
+        cover_url = content_store.put_upload(cover_data, fmt) if 'cover' in artifacts else None
+        print(f"[HIDE_MESSAGE] Saving cover image to: {cover_url}")
+        message_tensor = text_to_bits(message, 32)
+
+        # Generate stego image, decode it back and score it (batched with concurrent requests)
+        stego_array, extracted_bits_tensor, quality = hide_scheduler.run(
+            HideItem(cover_array, message_tensor, message, score=metrics == 'full', decode=scored))
+
+    with torch.no_grad():
+        # The thumbnail path already scored full metrics with its inference batch
+        sections = _score_hide(cover_array, stego_array, message_tensor, extracted_bits_tensor, quality,
+                               with_ssim=metrics == 'full') if scored else {}
+
+        # Save stego image to file
+        if 'stego' in artifacts:
+            stego_url, stego_data = content_store.put_array(stego_array, fmt), None
+            print(f"[HIDE_MESSAGE] Saving stego image to: {stego_url}")
+        else:
+            encoded = image_pool.encode_image(stego_array, fmt).result()
+            stego_url = None
+            stego_data = f"data:{OUTPUT_FORMATS[fmt]['mimetype']};base64,{base64.b64encode(encoded).decode('ascii')}"
+
+        verification = _verify_stego(mode, stego_array, message, message_tensor) if verify else None
+
+    # Return comprehensive metrics with separate cover and stego metrics
+    response_data = {
+        'success': True,
+        'stego_image': stego_url,
+        'cover_image': cover_url,
+        'message': message,
+        'mode': mode,
+        'format': fmt,
+        'metrics': metrics,
+        **mode_info,
+        **sections
+    }
+    if stego_data is not None:
+        response_data['stego_image_data'] = stego_data
+    if verification is not None:
+        response_data['verification'] = verification
+    if metrics != 'deferred':
+        return response_data, None
+
+    def compute_metrics():
+        # Decode the stored stego the same way extract will see it
+        if mode == 'tiled':
+            bits = torch.stack(run_tiles(extract_scheduler, list(split_tiles(stego_array))))
+        elif mode == 'residual':
+            bits = extract_scheduler.run(downsample_cover(stego_array))
+        else:
+            bits = extract_scheduler.run(stego_array)
+        with torch.no_grad():
+            return _score_hide(cover_array, stego_array, message_tensor, bits)['stego_metrics']
+    return response_data, compute_metrics
 
 @app.route('/steganography/hide', methods=['POST'])
 def hide_message():
@@ -198,63 +477,41 @@ def hide_message():
         print("[HIDE_MESSAGE] Missing image or message")
         return jsonify({'success': False, 'error': 'Missing image or message'}), 400
 
+    mode = request.form.get('mode', 'thumbnail').lower()
+    if mode not in HIDE_MODES:
+        return jsonify({'success': False, 'error': f"Unknown mode '{mode}', expected one of {', '.join(HIDE_MODES)}"}), 400
+
     try:
         print("[HIDE_MESSAGE] Processing request...")
-        # Load and process cover image
-        cover_image = Image.open(request.files['image']).convert('RGB')
-        message = request.form['message'][:32].ljust(32)  # Ensure message is 32 chars
-        
-        # Store original cover image as numpy array for metrics
-        cover_array = np.array(cover_image)
+        cover_data = request.files['image'].read()
 
-        # Prepare inputs for model
-        image_tensor = preprocess_image(cover_image).unsqueeze(0).to(device)
-        message_tensor = text_to_bits(message, 32).unsqueeze(0).to(device)
-
-        with torch.no_grad():
-            # Generate stego image
-            stego_tensor = generator(image_tensor, message_tensor)
-            stego_image = postprocess_image(stego_tensor)
-            
-            # Convert stego to numpy for metrics
-            stego_array = np.array(stego_image)
-            
-            # Resize cover to match stego dimensions if needed
-            if cover_array.shape != stego_array.shape:
-                cover_image_resized = cover_image.resize(stego_image.size)
-                cover_array = np.array(cover_image_resized)
-
-            # Calculate COVER image metrics (comparing to itself - should be perfect)
-            cover_psnr = 100.0  # Perfect PSNR for original
-            cover_ssim = 1.0     # Perfect SSIM for original
-            cover_ber = 0.0      # No error for original
-            
-            # Calculate STEGO image quality metrics (comparing stego to cover)
-            stego_psnr = calculate_psnr(cover_array, stego_array)
-            stego_ssim = calculate_ssim(cover_array, stego_array)
-            
-            # Extract message to calculate BER for stego
-            extracted_bits_tensor = decoder(stego_tensor)
-            original_bits = message_tensor.cpu().numpy().flatten()
-            extracted_bits = (extracted_bits_tensor > 0.5).cpu().numpy().flatten()
-            stego_ber = calculate_ber(original_bits, extracted_bits)
-            
-            # Get image statistics
-            cover_stats = get_image_stats(cover_array)
-            stego_stats = get_image_stats(stego_array)
-
-            # Save stego image to file
-            filename = f"stego_{uuid.uuid4().hex}.png"
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            print(f"[HIDE_MESSAGE] Saving stego image to: {file_path}")
-            stego_image.save(file_path, format='PNG')
-
-            # Save cover image for comparison
-            cover_filename = f"cover_{uuid.uuid4().hex}.png"
-            cover_path = os.path.join(UPLOAD_DIR, cover_filename)
-            print(f"[HIDE_MESSAGE] Saving cover image to: {cover_path}")
-            cover_image.save(cover_path, format='PNG')
-            print("[HIDE_MESSAGE] Images saved successfully")
+        # Identical cover, message and mode: reuse the response while its images still exist
+        verify = request.form.get('verify', 'false').lower() in ('1', 'true', 'yes')
+        try:
+            fmt, artifacts = _output_options(_optional_user_id())
+            metrics = _request_metrics()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        cache_key = result_cache.key('hide', cover_data, mode, request.form['message'], verify,
+                                     fmt, sorted(artifacts), metrics)
+        # Deferred metrics are computed per history row, so those responses are never cached
+        response_data, deferred = (result_cache.get(cache_key) if metrics != 'deferred' else None), None
+        if response_data is not None and not all(
+                content_store.exists_url(response_data[k]) for k in ('stego_image', 'cover_image')
+                if response_data[k]):
+            result_cache.discard(cache_key)
+            response_data = None
+        if response_data is None:
+            try:
+                response_data, deferred = _hide_response(cover_data, mode, request.form['message'], verify,
+                                                         fmt, artifacts, metrics)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            # Inline images are not worth keeping in memory
+            if 'stego_image_data' not in response_data and deferred is None:
+                result_cache.put(cache_key, response_data)
+        else:
+            print("[HIDE_MESSAGE] Serving cached result")
 
         # Optionally record history if JWT token is provided
         try:
@@ -268,52 +525,32 @@ def hide_message():
                 with app.app_context():
                     user = User.query.get(user_id)
                     if user:
+                        # Stego metrics are missing for metrics=none, and filled in later for deferred
+                        stego_metrics = response_data.get('stego_metrics', {})
                         hist = ProcessingHistory(
                             user_id=user.id,
                             operation_type='encode',
-                            image_path=f"/uploads/{filename}",
-                            cover_path=f"/uploads/{cover_filename}",
-                            message_length=len(message),
+                            image_path=response_data['stego_image'],
+                            cover_path=response_data['cover_image'],
+                            message_length=len(response_data['message']),
                             success=True,
                             # Cover image metrics (perfect values)
                             cover_psnr=100.0,
                             cover_ssim=1.0,
                             # Stego image metrics (actual calculated values)
-                            stego_psnr=float(stego_psnr),
-                            stego_ssim=float(stego_ssim),
-                            stego_ber=float(stego_ber)
+                            stego_psnr=stego_metrics.get('psnr'),
+                            stego_ssim=stego_metrics.get('ssim'),
+                            stego_ber=stego_metrics.get('ber')
                         )
                         db.session.add(hist)
                         db.session.commit()
+                        if deferred is not None:
+                            deferred_metrics.submit_metrics(app, hist.id, deferred)
         except Exception:
             # No token provided or invalid token - skip history recording
             pass
 
-        # Return comprehensive metrics with separate cover and stego metrics
-        response_data = {
-            'success': True,
-            'stego_image': f'/uploads/{filename}',
-            'cover_image': f'/uploads/{cover_filename}',
-            'message': message,
-            'cover_metrics': {
-                'psnr': float(cover_psnr),
-                'ssim': float(cover_ssim),
-                'ber': float(cover_ber)
-            },
-            'stego_metrics': {
-                'psnr': float(stego_psnr),
-                'ssim': float(stego_ssim),
-                'ber': float(stego_ber)
-            },
-            'cover_stats': cover_stats,
-            'stego_stats': stego_stats,
-            'model_performance': {
-                'quality_score': round((stego_psnr / 50) * 100, 2),
-                'similarity_score': round(stego_ssim * 100, 2),
-                'embedding_accuracy': round((1 - stego_ber) * 100, 2)
-            }
-        }
-        print(f"[HIDE_MESSAGE] Returning response with cover and stego metrics")
+        print(f"[HIDE_MESSAGE] Returning response (metrics={response_data.get('metrics', 'full')})")
         return jsonify(response_data), 200
 
     except Exception as e:
@@ -329,13 +566,18 @@ def analyze_image():
         return jsonify({'error': 'Missing image'}), 400
 
     try:
-        image = Image.open(request.files['image']).convert('RGB')
-        image_tensor = preprocess_image(image).unsqueeze(0).to(device)
+        image_data = request.files['image'].read()
+        cache_key = result_cache.key('analyze', image_data)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            is_stego, confidence_value = cached['is_stego'], cached['confidence']
+        else:
+            image_array = image_pool.decode(image_data)
 
-        with torch.no_grad():
-            disc_output = discriminator(image_tensor)
-            is_stego = torch.sigmoid(disc_output).item() < 0.5  # Less than 0.5 means it's more likely to be a stego image
-            confidence_value = float(abs(0.5 - torch.sigmoid(disc_output).item()) * 2)
+            prob = analyze_scheduler.run(image_array)
+            is_stego = prob < 0.5  # Less than 0.5 means it's more likely to be a stego image
+            confidence_value = float(abs(0.5 - prob) * 2)
+            result_cache.put(cache_key, {'is_stego': bool(is_stego), 'confidence': confidence_value})
 
         # Optionally record history if JWT token is provided
         try:
@@ -392,12 +634,23 @@ def extract_message():
         return jsonify({'error': 'Missing image'}), 400
 
     try:
-        image = Image.open(request.files['image']).convert('RGB')
-        image_tensor = preprocess_image(image).unsqueeze(0).to(device)
-
-        with torch.no_grad():
-            decoded_bits = decoder(image_tensor).squeeze(0).cpu().round()
-            extracted_message = bits_to_text(decoded_bits)
+        image_data = request.files['image'].read()
+        mode = request.form.get('mode', 'thumbnail').lower()
+        cache_key = result_cache.key('extract', image_data, mode == 'tiled')
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            extracted_message = cached['message']
+        elif mode == 'tiled':
+            # Decode every full-resolution tile and join their message slices
+            tiles = split_tiles(image_pool.decode_full(image_data))
+            if len(tiles) == 0:
+                return jsonify({'error': 'Image is too small for tiled mode'}), 400
+            extracted_message = join_message(torch.stack(run_tiles(extract_scheduler, list(tiles))))
+        else:
+            image_array = image_pool.decode(image_data)
+            extracted_message = bits_to_text(extract_scheduler.run(image_array))
+        if cached is None:
+            result_cache.put(cache_key, {'message': extracted_message})
 
         # Optionally record history if JWT token is provided
         try:
@@ -411,15 +664,13 @@ def extract_message():
                 with app.app_context():
                     user = User.query.get(user_id)
                     if user:
-                        # Save uploaded image for future reference
-                        filename = f"decoded_{uuid.uuid4().hex}.png"
-                        file_path = os.path.join(UPLOAD_DIR, filename)
-                        image.save(file_path, format='PNG')
+                        # Save uploaded image (full resolution) for future reference
+                        image_url = content_store.put_upload(image_data, _preferred_format(user.id))
                         
                         hist = ProcessingHistory(
                             user_id=user.id,
                             operation_type='decode',
-                            image_path=f"/uploads/{filename}",
+                            image_path=image_url,
                             message_length=len(extracted_message or ''),
                             success=True
                         )
@@ -434,9 +685,304 @@ def extract_message():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-if __name__ == '__main__':
-    # Ensure DB exists
-    with app.app_context():
-        db.create_all()
+# ===== BATCH ENDPOINTS =====
+def _decode_uploads(uploads, offset=0):
+    """Decode (name, bytes) uploads in parallel on the image pool.
+
+    Returns (decoded, errors) where decoded is a list of (index, name, array)
+    and errors is a list of per-item error results.
+    """
+    arrays, failures = image_pool.decode_many([data for _, data in uploads])
+    decoded, errors = [], []
+    for index, ((name, _), array, error) in enumerate(zip(uploads, arrays, failures), start=offset):
+        if error is None:
+            decoded.append((index, name, array))
+        else:
+            errors.append({'index': index, 'name': name, 'success': False, 'error': f'Could not decode image: {error}'})
+    return decoded, errors
+
+def _optional_user_id():
+    """Return the user id for an optional JWT in the request, or None"""
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+        user_id = int(user_id) if user_id is not None else None
+    except Exception:
+        return None
+    user = User.query.get(user_id) if user_id else None
+    return user.id if user else None
+
+def _record_history(user_id, rows):
+    """Add ProcessingHistory rows for a user, ignoring failures"""
+    if not user_id or not rows:
+        return
+    try:
+        for row in rows:
+            db.session.add(ProcessingHistory(user_id=user_id, success=True, **row))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+def _batch_response(results):
+    results.sort(key=lambda r: r['index'])
+    return {
+        'success': True,
+        'count': len(results),
+        'failed': sum(1 for r in results if not r['success']),
+        'results': results
+    }
+
+def _hide_batch_items(decoded, messages, default_message, fmt=OUTPUT_FORMAT, metrics='full'):
+    """Embed messages into decoded uploads. Returns (results, history rows)
+
+    `metrics` is full, fast (no SSIM) or none (no stego_metrics).
+    """
+    texts = [fit_text(messages[index] if index < len(messages) else (default_message or ''), 32)
+             for index, _, _ in decoded]
+    # All message bits encoded in one call
+    items = [(index, name, array, message, bits)
+             for (index, name, array), message, bits in zip(decoded, texts, text_to_bits(texts, 32))]
+
+    outputs = hide_scheduler.run_many([HideItem(array, bits, message, score=metrics == 'full',
+                                                decode=metrics != 'none')
+                                       for _, _, array, message, bits in items])
+    if not outputs:
+        return [], []
+    results, history = [], []
+    for (index, name, _, message, _), (stego_array, _, _) in zip(items, outputs):
+        stego_url = content_store.put_array(stego_array, fmt)
+        results.append({
+            'index': index,
+            'name': name,
+            'success': True,
+            'stego_image': stego_url,
+            'message': message
+        })
+        history.append({
+            'operation_type': 'encode',
+            'image_path': stego_url,
+            'message_length': len(message)
+        })
+    if metrics == 'none':
+        return results, history
+
+    # BER and margins for the whole batch in one pass; fast mode scores PSNR in one call too
+    diagnostics = bit_tracker.update(torch.stack([bits for *_, bits in items]),
+                                     torch.stack([decoded_bits for _, decoded_bits, _ in outputs]))
+    bers = diagnostics['ber'].tolist()
+    margins = diagnostics['margin'].tolist()
+    qualities = [quality for _, _, quality in outputs]
+    if metrics == 'fast':
+        qualities = image_metrics(np.stack([array for _, _, array, _, _ in items]),
+                                  np.stack([stego_array for stego_array, _, _ in outputs]), with_ssim=False)
+
+    for i, (result, row, quality) in enumerate(zip(results, history, qualities)):
+        stego_ber = round(bers[i], 6)
+        result['stego_metrics'] = {
+            'psnr': float(quality['psnr']),
+            'ssim': quality['ssim'],
+            'ms_ssim': quality['ms_ssim'],
+            'ber': float(stego_ber),
+            'bit_margin': round(margins[i], 4)
+        }
+        row.update(stego_psnr=float(quality['psnr']), stego_ssim=quality['ssim'], stego_ber=float(stego_ber))
+    return results, history
+
+def _extract_batch_items(decoded):
+    """Extract hidden messages from decoded uploads. Returns (results, history rows)"""
+    outputs = extract_scheduler.run_many([array for _, _, array in decoded])
+    messages = bits_to_text(torch.stack(outputs)) if outputs else []
+    results, history = [], []
+    for (index, name, _), extracted_message in zip(decoded, messages):
+        results.append({'index': index, 'name': name, 'success': True, 'message': extracted_message})
+        history.append({'operation_type': 'decode', 'message_length': len(extracted_message or '')})
+    return results, history
+
+def _analyze_batch_items(decoded):
+    """Run steganalysis over decoded uploads. Returns (results, history rows)"""
+    probs = analyze_scheduler.run_many([array for _, _, array in decoded])
+    results, history = [], []
+    for (index, name, _), prob in zip(decoded, probs):
+        confidence_value = float(abs(0.5 - prob) * 2)
+        results.append({
+            'index': index,
+            'name': name,
+            'success': True,
+            'is_stego': bool(prob < 0.5),
+            'confidence': confidence_value
+        })
+        history.append({'operation_type': 'analyze', 'confidence': confidence_value})
+    return results, history
+
+def _run_batch(operation, uploads, params, user_id, offset=0):
+    """Decode and process one chunk of uploads for a batch operation; returns per-item results"""
+    decoded, results = _decode_uploads(uploads, offset=offset)
+    if operation == 'hide':
+        processed, history = _hide_batch_items(decoded, params.get('messages', []), params.get('message'),
+                                               params.get('format') or _preferred_format(user_id),
+                                               params.get('metrics', 'full'))
+    elif operation == 'extract':
+        processed, history = _extract_batch_items(decoded)
+    elif operation == 'analyze':
+        processed, history = _analyze_batch_items(decoded)
+    else:
+        raise ValueError(f'Unknown batch operation: {operation}')
+    _record_history(user_id, history)
+    return results + processed
+
+def _batch_request(operation):
+    """Parse a batch upload request into (uploads, params) or raise ValueError"""
+    uploads = collect_uploads(request.files, max_items=MAX_BATCH_ITEMS)
+    if not uploads:
+        raise ValueError('Missing images')
+    params = {}
+    if operation == 'hide':
+        # Batch results come back together (or through /jobs), so there is no deferred mode here
+        params = {'messages': request.form.getlist('messages'), 'message': request.form.get('message'),
+                  'format': _request_format(),
+                  'metrics': _request_metrics(('full', 'fast', 'none'))}
+        if not params['messages'] and params['message'] is None:
+            raise ValueError('Missing message')
+    return uploads, params
+
+def _batch_endpoint(operation):
+    try:
+        uploads, params = _batch_request(operation)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    try:
+        results = _run_batch(operation, uploads, params, _optional_user_id())
+        return jsonify(_batch_response(results))
+    except Exception as e:
+        print(f"[{operation.upper()}_BATCH ERROR] {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/steganography/hide/batch', methods=['POST'])
+def hide_message_batch():
+    """Hide messages in many images (multipart `images` list and/or `archive` zip/tar).
+
+    Either a single `message` is embedded in every image or one `messages`
+    field per image is given in upload order.
+    """
+    return _batch_endpoint('hide')
+
+@app.route('/steganography/extract/batch', methods=['POST'])
+def extract_message_batch():
+    """Extract the hidden message from many images"""
+    return _batch_endpoint('extract')
+
+@app.route('/steganalysis/analyze/batch', methods=['POST'])
+def analyze_image_batch():
+    """Run steganalysis over many images"""
+    return _batch_endpoint('analyze')
+
+# ===== BACKGROUND JOBS =====
+def _run_batch_job(operation, uploads, params, user_id, progress):
+    """Process a batch job in chunks so interactive requests can interleave on the schedulers"""
+    results = []
+    for start in range(0, len(uploads), JOB_CHUNK_SIZE):
+        chunk = uploads[start:start + JOB_CHUNK_SIZE]
+        results.extend(_run_batch(operation, chunk, params, user_id, offset=start))
+        progress(len(results))
+    return _batch_response(results)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a batch hide/extract/analyze job (form field `operation`) and return its id"""
+    operation = request.form.get('operation')
+    if operation not in ('hide', 'extract', 'analyze'):
+        return jsonify({'success': False, 'error': 'operation must be one of hide, extract, analyze'}), 400
+    try:
+        uploads, params = _batch_request(operation)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    try:
+        user_id = _optional_user_id()
+        job = submit_job(app, operation, user_id, len(uploads),
+                         lambda progress: _run_batch_job(operation, uploads, params, user_id, progress))
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+
+def _visible_job(job_id):
+    """The BatchJob with this id, or None if it does not exist or belongs to another user.
+
+    Jobs submitted with a token are only visible to the same user; anonymous
+    jobs to anyone who has the id.
+    """
+    job = BatchJob.query.get(job_id)
+    if job is None or (job.user_id is not None and job.user_id != _optional_user_id()):
+        return None
+    return job
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll the status and progress of a batch job"""
+    job = _visible_job(job_id)
+    if not job:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(job_to_dict(job))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Fetch the per-item results of a finished batch job"""
+    job = _visible_job(job_id)
+    if not job:
+        return jsonify({'error': 'Not found'}), 404
+    if job.status == 'failed':
+        return jsonify({'success': False, 'status': job.status, 'error': job.error}), 500
+    if job.status != 'completed':
+        return jsonify({'success': False, 'status': job.status, 'error': 'Job not finished'}), 409
+    return jsonify(json.loads(job.result))
+
+@app.route('/steganalysis/analyze/stream', methods=['POST'])
+def analyze_image_stream():
+    """Analyze every image of a zip/tar `archive` and stream one JSON line per image.
+
+    The archive is read entry by entry and analyzed in chunks of STREAM_CHUNK_SIZE,
+    so memory stays flat regardless of archive size.
+    """
+    if 'archive' not in request.files:
+        return jsonify({'error': 'Missing archive'}), 400
+    # The request's file objects are closed once the view returns, so hand the
+    # generator its own spooled copy of the archive
+    archive = tempfile.TemporaryFile()
+    shutil.copyfileobj(request.files['archive'].stream, archive)
+    archive.seek(0)
+
+    def analyze_chunk(chunk):
+        decoded, lines = _decode_uploads(chunk)
+        for line in lines:
+            del line['index']
+        names = [name for _, name, _ in decoded]
+        probs = analyze_scheduler.run_many([array for _, _, array in decoded])
+        for name, prob in zip(names, probs):
+            lines.append({
+                'name': name,
+                'success': True,
+                'is_stego': bool(prob < 0.5),
+                'confidence': float(abs(0.5 - prob) * 2)
+            })
+        return ''.join(json.dumps(line) + '\n' for line in lines)
+
+    def generate():
+        chunk = []
+        try:
+            for entry in iter_archive_images(archive):
+                chunk.append(entry)
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    yield analyze_chunk(chunk)
+                    chunk = []
+            if chunk:
+                yield analyze_chunk(chunk)
+        except Exception as e:
+            yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+        finally:
+            archive.close()
+
+    return Response(generate(), mimetype='application/x-ndjson')
 
+if __name__ == '__main__':
     app.run(debug=False)
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Helpers for reading many images out of a single upload.
+
+Batch endpoints accept either a multipart list of images or one zip/tar
+archive. Archives are read entry by entry so large uploads never have to be
+unpacked to disk. Entries are held in memory, so the uncompressed size of each
+image (MAX_ARCHIVE_ENTRY_MB) and of all images together (MAX_ARCHIVE_TOTAL_MB)
+is capped; a compressed bomb is rejected before it is inflated past the limit.
+"""
+import os
+import tarfile
+import zipfile
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.tif', '.tiff'}
+MAX_ARCHIVE_ENTRY_BYTES = int(float(os.getenv('MAX_ARCHIVE_ENTRY_MB', '50')) * 1024 * 1024)
+MAX_ARCHIVE_TOTAL_BYTES = int(float(os.getenv('MAX_ARCHIVE_TOTAL_MB', '512')) * 1024 * 1024)
+
+
+def is_image_name(name):
+    base = os.path.basename(name)
+    if not base or base.startswith('.'):
+        return False
+    return os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _read_entry(name, size, stream, max_entry_bytes, max_total_bytes, total):
+    """Read one archive entry of declared `size`, after `total` bytes of earlier entries.
+
+    Raises ValueError if it would break either size limit. At most one byte
+    past the limit is inflated, in case the declared size is a lie.
+    """
+    limit = min(max_entry_bytes, max_total_bytes - total)
+    data = stream.read(limit + 1) if size <= limit else b''
+    if size > limit or len(data) > limit:
+        if limit < max_entry_bytes:
+            raise ValueError(f'Archive images exceed {max_total_bytes / (1024 * 1024):g} MB uncompressed')
+        raise ValueError(f'Archive entry {name} exceeds {max_entry_bytes / (1024 * 1024):g} MB uncompressed')
+    return data
+
+
+def iter_archive_images(fileobj, max_entries=None, max_entry_bytes=MAX_ARCHIVE_ENTRY_BYTES,
+                        max_total_bytes=MAX_ARCHIVE_TOTAL_BYTES):
+    """Yield (name, bytes) for every image entry of a zip or tar archive.
+
+    Raises ValueError once an entry is larger than `max_entry_bytes` or all
+    entries together are larger than `max_total_bytes` uncompressed.
+    """
+    count = 0
+    total = 0
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not is_image_name(info.filename):
+                    continue
+                if max_entries is not None and count >= max_entries:
+                    raise ValueError(f'Archive has more than {max_entries} images')
+                count += 1
+                with zf.open(info) as stream:
+                    data = _read_entry(info.filename, info.file_size, stream, max_entry_bytes,
+                                       max_total_bytes, total)
+                total += len(data)
+                yield info.filename, data
+        return
+
+    fileobj.seek(0)
+    try:
+        # Stream mode reads members sequentially without seeking back
+        tf = tarfile.open(fileobj=fileobj, mode='r|*')
+    except tarfile.TarError:
+        raise ValueError('Unsupported archive: expected a zip or tar file')
+    with tf:
+        for member in tf:
+            if not member.isfile() or not is_image_name(member.name):
+                continue
+            if max_entries is not None and count >= max_entries:
+                raise ValueError(f'Archive has more than {max_entries} images')
+            count += 1
+            data = _read_entry(member.name, member.size, tf.extractfile(member), max_entry_bytes,
+                               max_total_bytes, total)
+            total += len(data)
+            yield member.name, data
+
+
+def collect_uploads(files, list_field='images', archive_field='archive', max_items=None):
+    """Return [(name, bytes)] from a multipart image list and/or an archive upload"""
+    items = []
+    for storage in files.getlist(list_field):
+        if not storage or not storage.filename:
+            continue
+        items.append((storage.filename, storage.read()))
+    if archive_field in files:
+        remaining = None if max_items is None else max(0, max_items - len(items))
+        items.extend(iter_archive_images(files[archive_field].stream, max_entries=remaining))
+    if max_items is not None and len(items) > max_items:
+        raise ValueError(f'Too many images: at most {max_items} per batch')
+    return items
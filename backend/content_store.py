@@ -0,0 +1,143 @@
+"""
+Content-addressed upload store.
+
+Hide and extract used to save every image under a fresh UUID name, so a cover
+uploaded ten times was written ten times. Images are now stored once under the
+sha256 of their content, sharded as `uploads/ab/cd/<digest>.png` so no single
+directory grows past a few hundred entries. Uploaded files are keyed by their
+bytes and generated images by their pixels; a second put of the same content
+is a no-op apart from the hash.
+
+Blobs are reference counted through `ProcessingHistory.image_path` and
+`cover_path` and the URLs in `BatchJob.result`: `release` deletes a blob once
+nothing points at it. URLs also go out in responses that are never recorded
+(anonymous and synchronous batch hides) and to hides whose history row is not
+committed yet, so a blob stored or re-put within the last UPLOAD_GRACE_HOURS
+is never released. A dedup hit refreshes the file's mtime, which carries the
+grace window across restarts. Writes go through the WriteBehindStore, so a
+new blob is served from memory until it reaches disk.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from sqlalchemy import or_
+
+from db_models import ProcessingHistory, BatchJob
+from image_pool import OUTPUT_FORMAT, OUTPUT_FORMATS
+
+URL_PREFIX = '/uploads/'
+UPLOAD_GRACE_HOURS = float(os.getenv('UPLOAD_GRACE_HOURS', '24'))
+
+
+def blob_name(digest, ext='.png'):
+    """Sharded path of a blob relative to the upload directory"""
+    return f'{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def array_digest(array):
+    """sha256 of an image array's shape and pixels"""
+    h = hashlib.sha256(repr(array.shape).encode('ascii'))
+    h.update(array if array.flags.c_contiguous else array.tobytes())
+    return h.hexdigest()
+
+
+class ContentStore:
+    """Deduplicating image store on top of a WriteBehindStore"""
+
+    def __init__(self, directory, writer, grace_hours=UPLOAD_GRACE_HOURS):
+        self.directory = directory
+        self.writer = writer
+        self.grace = max(0.0, grace_hours) * 3600
+        # Guards only in-memory state and the check-then-act on single files; never
+        # held across the writer's back-pressure wait or database queries
+        self._lock = threading.Lock()
+        self._saving = set()
+        self._stored = 0
+        self._deduplicated = 0
+        self._released = 0
+
+    def url(self, name):
+        return URL_PREFIX + name
+
+    def exists(self, name):
+        return (name in self._saving or self.writer.contains(name)
+                or os.path.exists(os.path.join(self.directory, name)))
+
+    def exists_url(self, url):
+        return bool(url) and url.startswith(URL_PREFIX) and self.exists(url[len(URL_PREFIX):])
+
+    def put_array(self, array, fmt=OUTPUT_FORMAT):
+        """Store a uint8 HxWx3 array in one of OUTPUT_FORMATS and return its /uploads URL"""
+        name = blob_name(array_digest(array), OUTPUT_FORMATS[fmt]['ext'])
+        return self._put(name, self.writer.save_image, array, fmt)
+
+    def put_upload(self, data, fmt=OUTPUT_FORMAT):
+        """Store uploaded image bytes as a full-resolution RGB image and return its /uploads URL"""
+        name = blob_name(hashlib.sha256(data).hexdigest(), OUTPUT_FORMATS[fmt]['ext'])
+        return self._put(name, self.writer.save_upload, data, fmt)
+
+    def references(self, url):
+        """Number of history rows and batch job results pointing at a blob (needs an app context)"""
+        history = ProcessingHistory.query.filter(
+            or_(ProcessingHistory.image_path == url, ProcessingHistory.cover_path == url)).count()
+        jobs = BatchJob.query.filter(BatchJob.result.contains(f'"{url}"')).count()
+        return history + jobs
+
+    def release(self, urls):
+        """Delete the blobs among `urls` that nothing references any more (needs an app context)"""
+        removed = []
+        for url in set(u for u in urls if u and u.startswith(URL_PREFIX)):
+            name = url[len(URL_PREFIX):]
+            # Only content-addressed blobs; legacy UUID-named files are left alone
+            if name.count('/') != 2 or self.references(url):
+                continue
+            path = os.path.join(self.directory, name)
+            with self._lock:
+                # A put since the reference check (or a pending write) keeps the blob
+                if self._recent(name, path):
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                self._released += 1
+            removed.append(url)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {'stored': self._stored, 'deduplicated': self._deduplicated, 'released': self._released}
+
+    def _recent(self, name, path):
+        # Being saved, waiting for the writer, or stored/re-put within the grace window
+        if name in self._saving or self.writer.contains(name):
+            return True
+        try:
+            return time.time() - os.path.getmtime(path) < self.grace
+        except OSError:
+            return False
+
+    def _put(self, name, save, content, fmt):
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if self.exists(name):
+                self._deduplicated += 1
+                if not (name in self._saving or self.writer.contains(name)):
+                    # Restart the grace window of a blob already on disk
+                    try:
+                        os.utime(path)
+                    except OSError:
+                        pass
+                return self.url(name)
+            self._stored += 1
+            # Claimed under the lock so a concurrent put of the same content sees it
+            self._saving.add(name)
+        try:
+            # May block on the writer's buffer back-pressure, so outside the lock
+            save(content, name, fmt)
+        finally:
+            with self._lock:
+                self._saving.discard(name)
+        return self.url(name)
@@ -44,6 +44,19 @@ class ProcessingHistory(db.Model):
     # Steganalysis metrics
     confidence = db.Column(db.Float)  # Steganalysis confidence score
 
+class BatchJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    operation_type = db.Column(db.String(50))  # 'hide', 'extract', or 'analyze'
+    status = db.Column(db.String(20), default='queued')  # 'queued', 'running', 'completed', 'failed'
+    total = db.Column(db.Integer, default=0)  # Number of images in the job
+    processed = db.Column(db.Integer, default=0)  # Images processed so far
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    result = db.Column(db.Text)  # JSON-encoded per-item results
+    error = db.Column(db.Text)
+
 class Favorite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -57,7 +70,7 @@ class UserPreference(db.Model):
     theme = db.Column(db.String(20), default='light')
     notifications_enabled = db.Column(db.Boolean, default=True)
     max_file_size = db.Column(db.Integer, default=5242880)  # 5MB default
-    preferred_image_format = db.Column(db.String(10), default='png')
+    preferred_image_format = db.Column(db.String(10))  # unset: the server's OUTPUT_FORMAT
 
 class ApiKey(db.Model):
     id = db.Column(db.Integer, primary_key=True)
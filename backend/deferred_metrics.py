@@ -0,0 +1,77 @@
+"""
+Deferred hide metrics.
+
+With metrics=deferred the hide endpoint answers as soon as the stego image is
+stored, without PSNR/SSIM/BER. The metrics are computed afterwards on a small
+worker pool and written into the request's ProcessingHistory row, so history
+stays complete while interactive latency only covers the embedding itself.
+
+Each queued job holds the cover and stego arrays (full resolution for tiled
+and residual hides), so at most METRICS_QUEUE jobs wait for a worker. Beyond
+that the metrics are dropped and counted as failed; the history row keeps
+empty metric columns, as with metrics=none.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db_models import db, ProcessingHistory
+
+METRICS_WORKERS = int(os.getenv('METRICS_WORKERS', '1'))
+METRICS_QUEUE = int(os.getenv('METRICS_QUEUE', '64'))
+
+_executor = ThreadPoolExecutor(max_workers=METRICS_WORKERS, thread_name_prefix='metrics')
+# One slot per running or waiting job
+_slots = threading.BoundedSemaphore(METRICS_WORKERS + max(0, METRICS_QUEUE))
+_lock = threading.Lock()
+_counters = {'pending': 0, 'completed': 0, 'failed': 0}
+
+
+def submit_metrics(app, history_id, compute):
+    """Run `compute()` in the background and store its stego metrics in a ProcessingHistory row.
+
+    `compute` returns the hide response's `stego_metrics` dict (psnr, ssim, ber).
+    Returns None without running it when the queue is full.
+    """
+    if not _slots.acquire(blocking=False):
+        print(f"[METRICS {history_id}] Queue full, dropping deferred metrics", flush=True)
+        with _lock:
+            _counters['failed'] += 1
+        return None
+    with _lock:
+        _counters['pending'] += 1
+    try:
+        return _executor.submit(_run, app, history_id, compute)
+    except Exception:
+        _slots.release()
+        with _lock:
+            _counters['pending'] -= 1
+            _counters['failed'] += 1
+        raise
+
+
+def stats():
+    with _lock:
+        return dict(_counters, workers=METRICS_WORKERS, queue_limit=METRICS_QUEUE)
+
+
+def _run(app, history_id, compute):
+    outcome = 'failed'
+    try:
+        metrics = compute()
+        with app.app_context():
+            hist = ProcessingHistory.query.get(history_id)
+            if hist is not None:
+                hist.stego_psnr = metrics['psnr']
+                hist.stego_ssim = metrics['ssim']
+                hist.stego_ber = metrics['ber']
+                db.session.commit()
+            db.session.remove()
+        outcome = 'completed'
+    except Exception as e:
+        print(f"[METRICS {history_id} ERROR] {str(e)}", flush=True)
+    finally:
+        _slots.release()
+        with _lock:
+            _counters['pending'] -= 1
+            _counters[outcome] += 1
@@ -0,0 +1,159 @@
+"""
+Full-resolution embedding modes.
+
+The models only work on 96x96 images, so the default hide path returns a 96x96
+thumbnail that carries 32 characters. `tiled` mode cuts the full-resolution
+cover into 96x96 tiles, gives each tile its own 32-byte slice of the UTF-8
+message (tiles past the end of the message carry zero bytes), and stitches the
+stego tiles back into the cover. Pixels past the last full tile on the right
+and bottom edges are left untouched.
+
+All tiles of one image go through the scheduler as groups of up to
+TILE_BATCH_SIZE tiles, and each group runs as a single forward pass.
+
+`residual` mode is the cheap alternative: the generator runs once on the 96x96
+cover, and only its residual (stego minus cover) is upsampled and added to the
+full-resolution cover. Extraction is the normal 96x96 path, which downsamples
+the image again before decoding. Measure the BER cost per upscale factor with:
+
+    python embedding.py --images path/to/validation/images --factors 1 2 4 8
+"""
+import argparse
+import io
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from models.ganstego import bytes_to_bits, bits_to_bytes, bytes_to_text
+from preprocessing import MODEL_SIZE, list_images, open_model_image, reduce_for_model, image_to_array, to_model_batch, from_model_batch
+
+TILE_SIZE = MODEL_SIZE
+TILE_CHARS = 32
+TILE_BATCH_SIZE = int(os.getenv('TILE_BATCH_SIZE', '64'))
+
+
+def tile_grid(array, tile=TILE_SIZE):
+    """(rows, cols) of full tiles that fit in an (H, W, 3) array"""
+    return array.shape[0] // tile, array.shape[1] // tile
+
+
+def split_tiles(array, tile=TILE_SIZE):
+    """Cut an (H, W, 3) uint8 array into an (rows*cols, tile, tile, 3) array in raster order"""
+    rows, cols = tile_grid(array, tile)
+    grid = array[:rows * tile, :cols * tile].reshape(rows, tile, cols, tile, 3)
+    return np.ascontiguousarray(grid.swapaxes(1, 2)).reshape(rows * cols, tile, tile, 3)
+
+
+def stitch_tiles(cover, tiles, tile=TILE_SIZE):
+    """Copy of `cover` with the tiles from split_tiles written back in place"""
+    rows, cols = tile_grid(cover, tile)
+    out = cover.copy()
+    out[:rows * tile, :cols * tile] = tiles.reshape(rows, cols, tile, tile, 3).swapaxes(1, 2).reshape(
+        rows * tile, cols * tile, 3)
+    return out
+
+
+def split_message(message, tiles, chars=TILE_CHARS):
+    """Slice a message's UTF-8 bytes into one chunk per tile; raises ValueError if it does not fit.
+
+    A multi-byte character may straddle two tiles; join_message puts the bytes
+    back together before decoding.
+    """
+    if tiles == 0:
+        raise ValueError(f'Cover must be at least {TILE_SIZE}x{TILE_SIZE} for tiled mode')
+    data = message.encode('utf-8')
+    if len(data) > tiles * chars:
+        raise ValueError(f'Message too long for this cover: tiled capacity is {tiles * chars} bytes of UTF-8 text')
+    return [data[i * chars:(i + 1) * chars] for i in range(tiles)]
+
+
+def message_bits(chunks, chars=TILE_CHARS):
+    """(tiles, chars*8) bits for byte chunks, zero-padded so the message ends at the first NUL byte"""
+    return bytes_to_bits(chunks, chars)
+
+
+def join_message(tile_bits):
+    """Reassemble the text carried by (tiles, bits) decoded bits or probabilities (up to the first NUL byte)"""
+    data = b''.join(bits_to_bytes(tile_bits))
+    return bytes_to_text(data.split(b'\x00', 1)[0])
+
+
+def run_tiles(scheduler, items, batch_size=TILE_BATCH_SIZE):
+    """Run tile items through a BatchScheduler in groups and return the results in order"""
+    batch_size = max(1, batch_size)
+    futures = [scheduler.submit_group(items[i:i + batch_size]) for i in range(0, len(items), batch_size)]
+    return [result for future in futures for result in future.result()]
+
+
+def downsample_cover(array, size=MODEL_SIZE):
+    """Model input for a full-resolution (H, W, 3) array, reduced the same way uploads are decoded"""
+    return image_to_array(reduce_for_model(Image.fromarray(array), size), size)
+
+
+def add_residual(cover, model_cover, model_stego):
+    """Upsample (model_stego - model_cover) to the cover's size and add it to the cover"""
+    residual = torch.from_numpy(model_stego.astype(np.float32) - model_cover.astype(np.float32))
+    residual = F.interpolate(residual.permute(2, 0, 1).unsqueeze(0), size=cover.shape[:2],
+                             mode='bilinear', align_corners=False)
+    stego = torch.from_numpy(cover).float().add_(residual[0].permute(1, 2, 0))
+    return stego.round_().clamp_(0, 255).to(torch.uint8).numpy()
+
+
+def benchmark_residual(generator, decoder, arrays, factors, message_len=256):
+    """BER and PSNR of residual mode for covers upscaled by each factor.
+
+    Every validation image is resized to (96*factor)x(96*factor), embedded in
+    residual mode, saved as PNG and decoded through the normal upload path.
+    """
+    report = {}
+    with torch.no_grad():
+        for factor in factors:
+            side = MODEL_SIZE * factor
+            errors = bits = 0
+            psnr = []
+            for array in arrays:
+                cover = np.array(Image.fromarray(array).resize((side, side), Image.BICUBIC), dtype=np.uint8)
+                model_cover = downsample_cover(cover)
+                message = torch.randint(0, 2, (1, message_len)).float()
+                stego_small = from_model_batch(generator(to_model_batch([model_cover]), message))[0]
+                stego = add_residual(cover, model_cover, stego_small)
+
+                buf = io.BytesIO()
+                Image.fromarray(stego).save(buf, format='PNG')
+                buf.seek(0)
+                decoded = decoder(to_model_batch([image_to_array(open_model_image(buf))])) > 0.5
+                errors += (decoded != message.bool()).sum().item()
+                bits += message.numel()
+                mse = np.mean((cover.astype(np.float64) - stego.astype(np.float64)) ** 2)
+                psnr.append(100.0 if mse == 0 else 20 * np.log10(255.0 / np.sqrt(mse)))
+            report[f'{side}x{side}'] = {
+                'factor': factor,
+                'ber': round(errors / bits, 6) if bits else 0.0,
+                'psnr': round(float(np.mean(psnr)), 2) if psnr else 0.0
+            }
+    return report
+
+
+def main():
+    from models.loader import load_models
+
+    parser = argparse.ArgumentParser(description='Benchmark residual-mode BER at several upscale factors')
+    parser.add_argument('--images', required=True, help='directory of validation images')
+    parser.add_argument('--factors', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--limit', type=int, default=64)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    generator, decoder, _ = load_models(torch.device('cpu'))
+    arrays = [np.array(Image.open(path).convert('RGB'), dtype=np.uint8)
+              for path in list_images(args.images, args.limit)]
+    report = benchmark_residual(generator, decoder, arrays, args.factors)
+    print(json.dumps({'images': len(arrays), 'factors': report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Worker pool for image decoding and output encoding.
+
+Once inference is batched, PIL decode/encode dominates wall time, and doing it
+on the request thread uses one core per request. The pool runs
+`Image.open`/`convert` and PNG/WebP encodes on IMAGE_POOL_WORKERS threads (PIL
+releases the GIL while decoding and encoding) or processes
+(IMAGE_POOL=process). In process mode, batch decodes write their 96x96 results
+straight into a shared memory block instead of pickling arrays back.
+"""
+import io
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import MODEL_SIZE, open_model_image, image_to_array
+
+IMAGE_POOL = os.getenv('IMAGE_POOL', 'thread').lower()
+IMAGE_POOL_WORKERS = int(os.getenv('IMAGE_POOL_WORKERS', str(os.cpu_count() or 4)))
+
+# Lossless output encoders for saved images. Default-level PNG is the slowest
+# option; png-fast trades ~20% more bytes for ~4x faster encodes and lossless
+# WebP (fastest method) is both faster and smaller than default PNG.
+PNG_COMPRESS_LEVEL = int(os.getenv('PNG_COMPRESS_LEVEL', '6'))
+OUTPUT_FORMATS = {
+    'png': {'ext': '.png', 'mimetype': 'image/png',
+            'options': {'format': 'PNG', 'compress_level': PNG_COMPRESS_LEVEL}},
+    'png-fast': {'ext': '.png', 'mimetype': 'image/png',
+                 'options': {'format': 'PNG', 'compress_level': 1}},
+    'webp': {'ext': '.webp', 'mimetype': 'image/webp',
+             'options': {'format': 'WEBP', 'lossless': True, 'method': 0, 'quality': 0}},
+}
+OUTPUT_FORMAT = os.getenv('OUTPUT_FORMAT', 'png').lower()
+if OUTPUT_FORMAT not in OUTPUT_FORMATS:
+    raise ValueError(f"OUTPUT_FORMAT must be one of {', '.join(OUTPUT_FORMATS)}")
+
+
+# Worker functions live at module level so process pools can pickle them
+def decode_model_input(data, size=MODEL_SIZE):
+    """Decode image bytes into a (size, size, 3) uint8 model input"""
+    return image_to_array(open_model_image(io.BytesIO(data), size), size)
+
+
+def decode_full(data):
+    """Decode image bytes at full resolution into an (H, W, 3) uint8 array"""
+    return np.array(Image.open(io.BytesIO(data)).convert('RGB'), dtype=np.uint8)
+
+
+def _decode_into_shared(shm_name, count, index, data, size):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray((count, size, size, 3), dtype=np.uint8, buffer=shm.buf)
+        out[index] = decode_model_input(data, size)
+        del out
+    finally:
+        shm.close()
+
+
+def encode_image(array, fmt=OUTPUT_FORMAT):
+    """Encode a uint8 HxWx3 array in one of OUTPUT_FORMATS"""
+    buf = io.BytesIO()
+    Image.fromarray(array).save(buf, **OUTPUT_FORMATS[fmt]['options'])
+    return buf.getvalue()
+
+
+def encode_upload(data, fmt=OUTPUT_FORMAT):
+    """Decode uploaded image bytes at full resolution and re-encode them as RGB in one of OUTPUT_FORMATS"""
+    buf = io.BytesIO()
+    Image.open(io.BytesIO(data)).convert('RGB').save(buf, **OUTPUT_FORMATS[fmt]['options'])
+    return buf.getvalue()
+
+
+class ImagePool:
+    """Thread or process pool for decoding uploads and encoding PNGs"""
+
+    def __init__(self, kind=IMAGE_POOL, workers=IMAGE_POOL_WORKERS):
+        self.kind = 'process' if kind == 'process' else 'thread'
+        workers = max(1, int(workers))
+        if self.kind == 'process':
+            # Fork every worker right away, while the process is still single-threaded
+            # (create the pool before loading models or starting schedulers). spawn
+            # would re-run the app module, models and all, in every worker. Start the
+            # resource tracker first so workers share it for the shared memory blocks.
+            resource_tracker.ensure_running()
+            self._executor = ProcessPoolExecutor(max_workers=workers,
+                                                 mp_context=multiprocessing.get_context('fork'))
+            self._executor.submit(int).result()
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    def decode(self, data, size=MODEL_SIZE):
+        """Decode one upload into a (size, size, 3) uint8 array"""
+        return self.submit(decode_model_input, data, size).result()
+
+    def decode_full(self, data):
+        """Decode one upload at full resolution into an (H, W, 3) uint8 array"""
+        return self.submit(decode_full, data).result()
+
+    def decode_many(self, datas, size=MODEL_SIZE):
+        """Decode many uploads in parallel.
+
+        Returns (arrays, errors): an (N, size, size, 3) uint8 array and a list with
+        None or the exception for each input (failed slots are left zeroed).
+        """
+        count = len(datas)
+        errors = [None] * count
+        if count == 0:
+            return np.zeros((0, size, size, 3), dtype=np.uint8), errors
+        if self.kind == 'thread':
+            arrays = np.zeros((count, size, size, 3), dtype=np.uint8)
+            futures = [self.submit(decode_model_input, data, size) for data in datas]
+            for i, future in enumerate(futures):
+                try:
+                    arrays[i] = future.result()
+                except Exception as e:
+                    errors[i] = e
+            return arrays, errors
+
+        shm = shared_memory.SharedMemory(create=True, size=count * size * size * 3)
+        try:
+            futures = [self.submit(_decode_into_shared, shm.name, count, i, data, size)
+                       for i, data in enumerate(datas)]
+            for i, future in enumerate(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[i] = e
+            shared = np.ndarray((count, size, size, 3), dtype=np.uint8, buffer=shm.buf)
+            arrays = shared.copy()
+            del shared
+            return arrays, errors
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def encode_image(self, array, fmt=OUTPUT_FORMAT):
+        return self.submit(encode_image, array, fmt)
+
+    def encode_upload(self, data, fmt=OUTPUT_FORMAT):
+        return self.submit(encode_upload, data, fmt)
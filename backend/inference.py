@@ -0,0 +1,140 @@
+"""
+Micro-batching inference scheduler.
+
+Flask serves each request on its own thread. Running the GAN models once per
+request means every call is a batch of 1 and all threads fight over the same
+torch intra-op thread pool. A BatchScheduler owns a single worker thread that
+collects queued requests for up to `max_wait_ms`, runs them as one batch, and
+hands each caller its own slice of the output.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH', '16'))
+MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', '5'))
+
+
+class BatchScheduler:
+    """Group single-item requests into batches for a batched function.
+
+    `batch_fn` receives a list of items (whatever was passed to `submit`) and
+    must return a list of results of the same length and order.
+    """
+
+    def __init__(self, batch_fn, name='batch', max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._pending = None
+        self._worker = threading.Thread(target=self._run, name=f'{name}-scheduler', daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Queue one item and return a Future for its result."""
+        future = Future()
+        self._queue.put(([item], future, time.perf_counter(), False))
+        return future
+
+    def submit_group(self, items):
+        """Queue items that must run together in one forward pass.
+
+        The group is never split across batches; a group larger than
+        max_batch_size runs as a batch of its own. The Future resolves to the
+        list of results.
+        """
+        future = Future()
+        self._queue.put((list(items), future, time.perf_counter(), True))
+        return future
+
+    def run_group(self, items, timeout=None):
+        """Run items together in one forward pass and return their results in order."""
+        return self.submit_group(items).result(timeout=timeout)
+
+    def run(self, item, timeout=None):
+        """Queue one item and block until its result is ready."""
+        return self.submit(item).result(timeout=timeout)
+
+    def run_many(self, items, timeout=None):
+        """Queue several items at once and return their results in order."""
+        futures = [self.submit(item) for item in items]
+        return [f.result(timeout=timeout) for f in futures]
+
+    def stats(self):
+        """Return queue depth, batch size and wait time counters."""
+        with self._lock:
+            return {
+                'name': self.name,
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'batches': self._batches,
+                'items': self._items,
+                'last_batch_size': self._last_batch_size,
+                'avg_batch_size': round(self._items / self._batches, 3) if self._batches else 0.0,
+                'avg_wait_ms': round(self._total_wait / self._items * 1000, 3) if self._items else 0.0,
+                'max_wait_seen_ms': round(self._max_wait_seen * 1000, 3),
+            }
+
+    def _collect(self):
+        # Block for the first entry, then keep taking entries until the batch is
+        # full or the latency window closes. An entry that does not fit is held
+        # back for the next batch.
+        if self._pending is not None:
+            first, self._pending = self._pending, None
+        else:
+            first = self._queue.get()
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    entry = self._queue.get_nowait()
+                else:
+                    entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(entry[0]) > self.max_batch_size:
+                self._pending = entry
+                break
+            batch.append(entry)
+            size += len(entry[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            items = [item for entry_items, _, _, _ in batch for item in entry_items]
+            waits = [started - queued_at for _, _, queued_at, _ in batch]
+            with self._lock:
+                self._batches += 1
+                self._items += len(items)
+                self._last_batch_size = len(items)
+                self._total_wait += sum(w * len(entry[0]) for w, entry in zip(waits, batch))
+                self._max_wait_seen = max(self._max_wait_seen, max(waits))
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f'{self.name}: batch_fn returned {len(results)} results for {len(items)} items')
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for entry_items, future, _, is_group in batch:
+                entry_results = results[offset:offset + len(entry_items)]
+                offset += len(entry_items)
+                future.set_result(entry_results if is_group else entry_results[0])
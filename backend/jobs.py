@@ -0,0 +1,112 @@
+"""
+Background batch jobs.
+
+Large batch requests are accepted immediately, persisted as a BatchJob row and
+processed by a small worker pool so they do not hold a Flask worker for the
+whole computation. Clients poll /jobs/<id> and /jobs/<id>/result.
+
+Queued jobs keep their uploads in memory, so at most MAX_QUEUED_JOBS may wait
+for a worker; further submissions are refused with JobQueueFull.
+"""
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from db_models import db, BatchJob
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+MAX_QUEUED_JOBS = int(os.getenv('MAX_QUEUED_JOBS', '8'))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+# One slot per running or waiting job
+_slots = threading.BoundedSemaphore(JOB_WORKERS + max(0, MAX_QUEUED_JOBS))
+
+
+class JobQueueFull(Exception):
+    """Raised by submit_job when MAX_QUEUED_JOBS jobs are already waiting"""
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'operation_type': job.operation_type,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error
+    }
+
+
+def submit_job(app, operation, user_id, total, runner):
+    """Persist a queued job and schedule `runner(progress)` on the worker pool.
+
+    `runner` must return a JSON-serializable result; `progress(n)` records how
+    many items have been processed so far. Raises JobQueueFull when the queue
+    is full.
+    """
+    if not _slots.acquire(blocking=False):
+        raise JobQueueFull(f'Too many queued jobs (at most {MAX_QUEUED_JOBS}), try again later')
+    try:
+        job = BatchJob(id=uuid.uuid4().hex, user_id=user_id, operation_type=operation,
+                       status='queued', total=total, processed=0)
+        db.session.add(job)
+        db.session.commit()
+        _executor.submit(_run_job, app, job.id, runner)
+    except Exception:
+        _slots.release()
+        raise
+    return job
+
+
+def _run_job(app, job_id, runner):
+    try:
+        _process_job(app, job_id, runner)
+    finally:
+        _slots.release()
+
+
+def _process_job(app, job_id, runner):
+    with app.app_context():
+        job = BatchJob.query.get(job_id)
+        if job is None:
+            return
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        def progress(processed):
+            job.processed = processed
+            db.session.commit()
+
+        try:
+            result = runner(progress)
+            job.result = json.dumps(result)
+            job.status = 'completed'
+        except Exception as e:
+            print(f"[JOB {job_id} ERROR] {str(e)}", flush=True)
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        db.session.remove()
+
+
+def fail_interrupted_jobs():
+    """Mark jobs left queued/running by a previous process as failed.
+
+    Job inputs only live in memory, so they cannot be resumed after a restart.
+    """
+    interrupted = BatchJob.query.filter(BatchJob.status.in_(['queued', 'running'])).all()
+    for job in interrupted:
+        job.status = 'failed'
+        job.error = 'Interrupted by server restart'
+        job.finished_at = datetime.utcnow()
+    if interrupted:
+        db.session.commit()
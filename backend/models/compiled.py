@@ -0,0 +1,120 @@
+"""
+Ahead-of-time TorchScript artifacts for the GAN models.
+
+Building the models in eager mode on every start and running the U-Net
+`forward` through Python dispatch is slow and jittery. The models are traced
+once for the fixed 96x96 input shape, frozen, and saved under MODEL_CACHE_DIR
+keyed by checkpoint hash, torch version, device type and variant (the
+quantization mode that was actually applied).
+Later starts load the cached artifacts directly (`load_cached_models`) without
+building the eager models or reading the checkpoint weights.
+
+Enable with MODEL_BACKEND=torchscript, or prebuild the cache with:
+
+    python -m models.compiled
+"""
+import os
+
+import torch
+
+from models.loader import MODEL_PATH, checkpoint_hash
+
+IMAGE_SIZE = 96
+MODEL_NAMES = ('generator', 'decoder', 'discriminator')
+MODEL_CACHE_DIR = os.getenv(
+    'MODEL_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'model_cache')
+)
+
+
+def artifact_path(name, ckpt_hash, variant='', device='cpu', cache_dir=MODEL_CACHE_DIR, ext='.pt'):
+    torch_version = torch.__version__.replace('+', '_')
+    device_type = torch.device(device).type
+    suffix = f'-{variant}' if variant and variant != 'none' else ''
+    return os.path.join(cache_dir, f'{name}-{ckpt_hash[:16]}-torch{torch_version}-{device_type}{suffix}{ext}')
+
+
+def example_inputs(name, message_len=256, device='cpu'):
+    image = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE, device=device)
+    if name == 'generator':
+        return (image, torch.zeros(1, message_len, device=device))
+    return (image,)
+
+
+def trace_model(model, inputs):
+    """Trace and freeze an eval-mode model for inference"""
+    with torch.no_grad():
+        traced = torch.jit.trace(model.eval(), inputs)
+        return torch.jit.freeze(traced)
+
+
+def load_or_export(name, model, ckpt_hash, device, variant='', message_len=256):
+    """Load the cached artifact for `model`, exporting it first if it is missing"""
+    path = artifact_path(name, ckpt_hash, variant, device)
+    if os.path.exists(path):
+        try:
+            return torch.jit.load(path, map_location=device)
+        except Exception as e:
+            print(f"Warning: Could not load cached {name} ({str(e)}), re-exporting", flush=True)
+    print(f"[Startup] Exporting TorchScript {name} to {path}", flush=True)
+    scripted = trace_model(model, example_inputs(name, message_len, device))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent workers never load a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    torch.jit.save(scripted, tmp_path)
+    os.replace(tmp_path, path)
+    return scripted
+
+
+def load_cached_models(ckpt_hash, device, variant=''):
+    """The three cached TorchScript models, or None unless all of them exist and load"""
+    if ckpt_hash is None:
+        return None
+    paths = [artifact_path(name, ckpt_hash, variant, device) for name in MODEL_NAMES]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    try:
+        return tuple(torch.jit.load(path, map_location=device) for path in paths)
+    except Exception as e:
+        print(f"Warning: Could not load cached TorchScript models ({str(e)}), rebuilding", flush=True)
+        return None
+
+
+def load_compiled_models(generator, decoder, discriminator, device, variant='', model_path=MODEL_PATH,
+                         ckpt_hash=None):
+    """Return TorchScript versions of the three models, or the eager ones if they cannot be cached.
+
+    Pass `ckpt_hash` when the caller has already hashed the checkpoint.
+    """
+    if ckpt_hash is None:
+        ckpt_hash = checkpoint_hash(model_path)
+    if ckpt_hash is None:
+        # Without a checkpoint the weights are random per process, nothing to cache
+        print("Warning: No checkpoint to key the TorchScript cache, serving eager models", flush=True)
+        return generator, decoder, discriminator
+    try:
+        message_len = generator.msg_proj.in_features
+        models = (
+            load_or_export('generator', generator, ckpt_hash, device, variant, message_len),
+            load_or_export('decoder', decoder, ckpt_hash, device, variant, message_len),
+            load_or_export('discriminator', discriminator, ckpt_hash, device, variant, message_len),
+        )
+        print("[Startup] Serving TorchScript models", flush=True)
+        return models
+    except Exception as e:
+        print(f"Warning: TorchScript export failed, serving eager models: {str(e)}", flush=True)
+        return generator, decoder, discriminator
+
+
+def main():
+    from models.loader import load_models
+    from models.quantization import quantize_from_env
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    generator, decoder, discriminator = load_models(device)
+    decoder, discriminator, quantize_mode = quantize_from_env(decoder, discriminator)
+    load_compiled_models(generator, decoder, discriminator, device, variant=quantize_mode)
+
+
+if __name__ == '__main__':
+    main()
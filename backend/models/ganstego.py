@@ -1,3 +1,8 @@
+import base64
+import codecs
+from collections import OrderedDict
+
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -39,9 +44,16 @@ class AdvancedGenerator(nn.Module):
         self.final_act = nn.Tanh()
         self.msg_proj = nn.Linear(message_len, 96*96)
 
+    def project_message(self, message):
+        # (B, message_len) -> (B, 1, 96, 96) map concatenated to the image
+        return self.msg_proj(message).view(message.size(0), 1, 96, 96)
+
     def forward(self, image, message):
         B,_,H,W = image.shape
         msg_map = self.msg_proj(message).view(B,1,H,W)
+        return self.embed(image, msg_map)
+
+    def embed(self, image, msg_map):
         x = torch.cat([image, msg_map], 1)
         d1 = self.down1(x)
         d2 = self.down2(self.pool1(d1))
@@ -121,30 +133,79 @@ class AdvancedDiscriminator(nn.Module):
     def forward(self, x):
         return self.main(x)
 
+def strip_for_inference(model):
+    """Bake spectral norm into plain weights and remove dropout layers, in place.
+
+    `spectral_norm` recomputes the normalized weight on every forward call, even
+    in eval mode, and Dropout layers are no-ops at inference time. The stripped
+    model uses plain weights (W / sigma from the trained u, v vectors) and drops
+    those layers, so its outputs match `model.eval()`. Returns the model.
+    """
+    from torch.nn.utils.spectral_norm import SpectralNorm
+    model.eval()
+    for module in model.modules():
+        if any(isinstance(hook, SpectralNorm) for hook in module._forward_pre_hooks.values()):
+            nn.utils.remove_spectral_norm(module)
+        if isinstance(module, nn.Sequential):
+            kept = [m for m in module if not isinstance(m, (nn.Dropout, nn.Dropout2d))]
+            if len(kept) != len(module):
+                module._modules = OrderedDict((str(i), m) for i, m in enumerate(kept))
+    return model
+
+# Message codec: text <-> UTF-8 bytes <-> (max_len*8,) bit tensors, MSB first. Every
+# function also takes a batch (list of messages or a (B, max_len*8) tensor) and
+# works on whole arrays with numpy packbits/unpackbits instead of per-bit loops.
+
+def fit_text(text, max_len=32):
+    """Longest prefix of `text` that fits in max_len UTF-8 bytes, space-padded to exactly max_len bytes"""
+    text = text.encode('utf-8')[:max_len].decode('utf-8', errors='ignore')
+    return text + ' ' * (max_len - len(text.encode('utf-8')))
+
+def bytes_to_bits(data, max_len=32):
+    # bytes -> (max_len*8,) float tensor; a list of bytes -> (B, max_len*8). Zero-padded / truncated.
+    single = isinstance(data, (bytes, bytearray))
+    rows = [data] if single else list(data)
+    buf = b''.join(bytes(row[:max_len]).ljust(max_len, b'\x00') for row in rows)
+    bits = np.unpackbits(np.frombuffer(buf, dtype=np.uint8).reshape(len(rows), max_len), axis=1)
+    bits = torch.from_numpy(bits).float()
+    return bits[0] if single else bits
+
 def text_to_bits(text, max_len=32):
-    bits = ''.join(format(ord(c), '08b') for c in text)
-    bits = bits.ljust(max_len*8, '0')
-    return torch.tensor([int(bit) for bit in bits[:max_len*8]], dtype=torch.float32)
+    # UTF-8 encode a message (or a list of messages) into bits, see bytes_to_bits
+    if isinstance(text, str):
+        return bytes_to_bits(text.encode('utf-8'), max_len)
+    return bytes_to_bits([t.encode('utf-8') for t in text], max_len)
+
+def bits_to_bytes(bits):
+    # Convert bits (values > 0.5 count as 1) to bytes: (L,) -> bytes, (B, L) -> list of bytes.
+    if isinstance(bits, torch.Tensor):
+        bits = bits.detach().cpu().numpy()
+    bits = np.asarray(bits) > 0.5
+    packed = np.packbits(bits.reshape(-1, bits.shape[-1]), axis=1)
+    if bits.ndim == 1:
+        return packed[0].tobytes()
+    return [row.tobytes() for row in packed]
 
 def bits_to_text(bits):
-    # Convert a sequence of bits (0/1) to bytes, then to a safe string.
-    byte_vals = []
-    for b in range(0, len(bits), 8):
-        byte = bits[b:b+8]
-        byte_str = ''.join([str(int(bit)) for bit in byte])
-        byte_vals.append(int(byte_str, 2))
-    data = bytes(byte_vals)
-    # If data is printable ASCII, return as text. Otherwise return a base64 wrapper so
-    # frontends can handle binary payloads safely.
+    # Convert bits to bytes, then to a safe string (a list of strings for a batch).
+    data = bits_to_bytes(bits)
+    if isinstance(data, bytes):
+        return bytes_to_text(data)
+    return [bytes_to_text(d) for d in data]
+
+# Tab, newline and carriage return are allowed in text messages (str.isprintable rejects them)
+_ALLOWED_WHITESPACE = {ord('\t'): None, ord('\n'): None, ord('\r'): None}
+
+def bytes_to_text(data):
+    # If data (without trailing NUL padding) is printable UTF-8 text, return it; a multi-byte
+    # character cut off at the end of the capacity is dropped. Otherwise return a base64
+    # wrapper so frontends can handle binary payloads safely.
+    data = bytes(data).rstrip(b'\x00')
     try:
-        import base64
-        if all((32 <= c <= 126) or c in (9,10,13) for c in data):
-            return data.decode('ascii').rstrip('\x00')
-        else:
-            return 'RAWB64:' + base64.b64encode(data).decode('ascii')
-    except Exception:
-        # Fallback: best-effort decode
-        try:
-            return data.decode('utf-8', errors='replace').rstrip('\x00')
-        except Exception:
-            return ''
\ No newline at end of file
+        # Incremental decoder: an incomplete trailing sequence is held back instead of raising
+        text = codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+    except UnicodeDecodeError:
+        text = None
+    if text is not None and text.translate(_ALLOWED_WHITESPACE).isprintable():
+        return text
+    return 'RAWB64:' + base64.b64encode(data).decode('ascii')
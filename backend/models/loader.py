@@ -0,0 +1,111 @@
+"""
+Build the GAN models and load the trained checkpoint.
+
+Shared by the Flask app and the offline model tools (quantization checks,
+export) so they all see exactly the same weights.
+"""
+import copy
+import hashlib
+import os
+
+import numpy as np
+import torch
+from torch import serialization as torch_serialization
+
+from models.ganstego import AdvancedGenerator, AdvancedDecoder, AdvancedDiscriminator, strip_for_inference
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'final_ganstego.pth')
+
+# Allowlist numpy scalar for safe torch.load when weights_only=True
+try:
+    torch_serialization.add_safe_globals([np._core.multiarray.scalar, np.dtype])
+except Exception:
+    pass
+
+
+def checkpoint_hash(model_path=MODEL_PATH):
+    """sha256 of the checkpoint file, or None if it does not exist"""
+    if not os.path.exists(model_path):
+        return None
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_models(device, message_len=256, model_path=MODEL_PATH, strip=True):
+    """Return (generator, decoder, discriminator) in eval mode with checkpoint weights if available.
+
+    With `strip` the decoder and discriminator are converted to inference-only
+    modules (spectral norm baked into the conv weights, dropout removed).
+    """
+    generator = AdvancedGenerator(message_len).to(device)
+    decoder = AdvancedDecoder(message_len).to(device)
+    discriminator = AdvancedDiscriminator().to(device)
+
+    if os.path.exists(model_path):
+        try:
+            print("[Startup] Loading model checkpoint...", flush=True)
+            # Fallback to legacy load for this checkpoint
+            checkpoint = torch.load(model_path, map_location=device, weights_only=False)
+            print("[Startup] Checkpoint loaded, applying state dicts...", flush=True)
+            if isinstance(checkpoint, dict):
+                generator.load_state_dict(checkpoint['generator'])
+                decoder.load_state_dict(checkpoint['decoder'])
+                discriminator.load_state_dict(checkpoint['discriminator'])
+            else:
+                print("Model format is different, trying direct load...")
+                if hasattr(checkpoint, 'generator'):
+                    generator = checkpoint.generator
+                if hasattr(checkpoint, 'decoder'):
+                    decoder = checkpoint.decoder
+                if hasattr(checkpoint, 'discriminator'):
+                    discriminator = checkpoint.discriminator
+            print("Model loaded successfully!", flush=True)
+        except Exception as e:
+            print(f"Warning: Error loading model: {str(e)}", flush=True)
+    else:
+        print(f"Warning: Model file {model_path} not found!", flush=True)
+
+    # Set models to evaluation mode
+    generator.eval()
+    decoder.eval()
+    discriminator.eval()
+
+    if strip:
+        decoder, discriminator = strip_models(decoder, discriminator, device)
+    return generator, decoder, discriminator
+
+
+def strip_model(model, device):
+    """Inference-only copy of an eval-mode model and the max output difference on a fixed probe.
+
+    Returns (stripped copy, diff); the original model is left untouched.
+    """
+    probe = torch.rand(2, 3, 96, 96, generator=torch.Generator().manual_seed(0)).to(device) * 2 - 1
+    stripped = strip_for_inference(copy.deepcopy(model))
+    with torch.no_grad():
+        diff = (stripped(probe) - model(probe)).abs().max().item()
+    return stripped, diff
+
+
+def strip_models(decoder, discriminator, device, atol=1e-5):
+    """Bake spectral norm / drop dropout in the decoder and discriminator.
+
+    Each stripped copy replaces its eval model only if its outputs match within
+    `atol`; otherwise the original is kept. Returns (decoder, discriminator).
+    """
+    models = {'decoder': decoder, 'discriminator': discriminator}
+    for name, model in models.items():
+        try:
+            stripped, diff = strip_model(model, device)
+        except Exception as e:
+            print(f"Warning: Could not strip {name} for inference: {str(e)}", flush=True)
+            continue
+        if diff > atol:
+            print(f"Warning: Stripped {name} differs from eval model by {diff:.2e}, keeping the eval model",
+                  flush=True)
+            continue
+        models[name] = stripped
+    return models['decoder'], models['discriminator']
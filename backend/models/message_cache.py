@@ -0,0 +1,93 @@
+"""
+LRU cache of projected message maps.
+
+`AdvancedGenerator.forward` projects the 256-bit message to a 96x96 map with a
+256->9216 Linear on every call. Many hide requests embed the same watermark
+into many covers, so the projected maps are cached by message text. Messages
+registered at startup (WATERMARK_MESSAGES_FILE, one per line) are precomputed
+and never evicted.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', '256'))
+WATERMARK_MESSAGES_FILE = os.getenv('WATERMARK_MESSAGES_FILE')
+
+
+class MessageProjectionCache:
+    """Bounded LRU of generator.project_message outputs keyed by the 32-char message"""
+
+    def __init__(self, generator, max_size=MESSAGE_CACHE_SIZE):
+        self.generator = generator
+        self.max_size = max(0, int(max_size))
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _project(self, bits):
+        with torch.no_grad():
+            return self.generator.project_message(bits)
+
+    def register(self, messages, bits):
+        """Precompute and pin the maps for watermark messages (never evicted)"""
+        if not messages:
+            return
+        maps = self._project(torch.stack(bits))
+        with self._lock:
+            for message, msg_map in zip(messages, maps):
+                self._pinned[message] = msg_map
+
+    def get_many(self, messages, bits):
+        """Return a (B, 1, 96, 96) batch of maps, projecting only the cache misses in one call"""
+        maps = [None] * len(messages)
+        missing = []
+        with self._lock:
+            for i, message in enumerate(messages):
+                msg_map = self._pinned.get(message)
+                if msg_map is None:
+                    msg_map = self._entries.get(message)
+                    if msg_map is not None:
+                        self._entries.move_to_end(message)
+                if msg_map is None:
+                    missing.append(i)
+                else:
+                    maps[i] = msg_map
+            self.hits += len(messages) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            projected = self._project(torch.stack([bits[i] for i in missing]))
+            with self._lock:
+                for i, msg_map in zip(missing, projected):
+                    maps[i] = msg_map
+                    if self.max_size:
+                        self._entries[messages[i]] = msg_map
+                        self._entries.move_to_end(messages[i])
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return torch.stack(maps)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'pinned': len(self._pinned),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def load_watermark_messages(path=WATERMARK_MESSAGES_FILE):
+    """Read registered watermark messages, one per line"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\r\n') for line in f if line.strip()]
@@ -0,0 +1,154 @@
+"""
+ONNX Runtime CPU backend for the GAN models.
+
+The generator, decoder and discriminator are exported to ONNX (dynamic batch,
+fixed 96x96 input) and cached next to the TorchScript artifacts. ONNX Runtime
+fuses Conv+GroupNorm+LeakyReLU chains and gives explicit thread control, which
+usually beats eager PyTorch on CPU for models this small.
+
+Enable with MODEL_BACKEND=onnx (requires `pip install onnxruntime`). Every
+export is checked against the PyTorch outputs before it is served; check
+parity by hand with:
+
+    python -m models.onnx_backend
+"""
+import os
+
+import numpy as np
+
+ONNX_OPSET = int(os.getenv('ONNX_OPSET', '17'))
+ONNX_THREADS = int(os.getenv('ONNX_THREADS', '0'))  # 0 lets ONNX Runtime decide
+ONNX_PARITY_ATOL = float(os.getenv('ONNX_PARITY_ATOL', '1e-3'))
+
+INPUT_NAMES = {
+    'generator': ['image', 'message'],
+    'decoder': ['image'],
+    'discriminator': ['image'],
+}
+
+
+class OnnxModel:
+    """Callable wrapper around an ONNX Runtime session.
+
+    Accepts torch tensors or numpy arrays like the PyTorch module it replaces
+    and returns the same kind it was given. Only numpy and onnxruntime are
+    needed to run it.
+    """
+
+    def __init__(self, path, threads=ONNX_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, *inputs):
+        feeds = {}
+        for name, value in zip(self.input_names, inputs):
+            if not isinstance(value, np.ndarray):
+                value = value.detach().cpu().numpy()
+            feeds[name] = np.ascontiguousarray(value, dtype=np.float32)
+        output = self.session.run(None, feeds)[0]
+        if isinstance(inputs[0], np.ndarray):
+            return output
+        import torch
+        return torch.from_numpy(output)
+
+    def eval(self):
+        return self
+
+
+def export_onnx(name, model, path, message_len=256):
+    """Export one of the GAN models to ONNX with a dynamic batch dimension"""
+    import torch
+    from models.compiled import example_inputs
+
+    input_names = INPUT_NAMES[name]
+    dynamic_axes = {n: {0: 'batch'} for n in input_names + ['output']}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent workers never load a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with torch.no_grad():
+        torch.onnx.export(model.eval(), example_inputs(name, message_len), tmp_path,
+                          input_names=input_names, output_names=['output'],
+                          dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET)
+    os.replace(tmp_path, path)
+
+
+def check_parity(name, model, onnx_model, batch_size=2, message_len=256):
+    """Max absolute difference between PyTorch and ONNX Runtime outputs on random inputs"""
+    import torch
+
+    generator = torch.Generator().manual_seed(0)
+    image = torch.rand(batch_size, 3, 96, 96, generator=generator) * 2 - 1
+    inputs = (image,)
+    if name == 'generator':
+        inputs = (image, torch.randint(0, 2, (batch_size, message_len), generator=generator).float())
+    with torch.no_grad():
+        expected = model(*inputs)
+    return float((expected - onnx_model(*inputs)).abs().max())
+
+
+def load_onnx_models(generator, decoder, discriminator, variant='', model_path=None, ckpt_hash=None):
+    """Return ONNX Runtime versions of the three models, or the PyTorch ones on any failure.
+
+    Pass `ckpt_hash` when the caller has already hashed the checkpoint.
+    """
+    from models.compiled import artifact_path
+    from models.loader import MODEL_PATH, checkpoint_hash
+
+    if ckpt_hash is None:
+        ckpt_hash = checkpoint_hash(model_path or MODEL_PATH)
+    if ckpt_hash is None:
+        print("Warning: No checkpoint to key the ONNX cache, serving PyTorch models", flush=True)
+        return generator, decoder, discriminator
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("Warning: onnxruntime is not installed, serving PyTorch models", flush=True)
+        return generator, decoder, discriminator
+
+    message_len = generator.msg_proj.in_features
+    models = {'generator': generator, 'decoder': decoder, 'discriminator': discriminator}
+    try:
+        for name, model in models.items():
+            path = artifact_path(name, ckpt_hash, variant, ext=f'-opset{ONNX_OPSET}.onnx')
+            if not os.path.exists(path):
+                print(f"[Startup] Exporting ONNX {name} to {path}", flush=True)
+                export_onnx(name, model, path, message_len)
+            onnx_model = OnnxModel(path)
+            diff = check_parity(name, model, onnx_model, message_len=message_len)
+            if diff > ONNX_PARITY_ATOL:
+                raise RuntimeError(f'{name} ONNX output differs from PyTorch by {diff:.2e}')
+            models[name] = onnx_model
+        print("[Startup] Serving ONNX Runtime models", flush=True)
+        return models['generator'], models['decoder'], models['discriminator']
+    except Exception as e:
+        print(f"Warning: ONNX backend unavailable, serving PyTorch models: {str(e)}", flush=True)
+        return generator, decoder, discriminator
+
+
+def main():
+    import torch
+    from models.compiled import artifact_path
+    from models.loader import load_models, checkpoint_hash
+
+    torch.manual_seed(0)
+    generator, decoder, discriminator = load_models(torch.device('cpu'))
+    ckpt_hash = checkpoint_hash() or 'uncheckpointed'
+    message_len = generator.msg_proj.in_features
+    for name, model in (('generator', generator), ('decoder', decoder), ('discriminator', discriminator)):
+        path = artifact_path(name, ckpt_hash, ext=f'-opset{ONNX_OPSET}.onnx')
+        if not os.path.exists(path):
+            export_onnx(name, model, path, message_len)
+        diff = check_parity(name, model, OnnxModel(path), message_len=message_len)
+        status = 'OK' if diff <= ONNX_PARITY_ATOL else 'MISMATCH'
+        print(f"{name}: max abs diff {diff:.2e} ({status}) -> {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+INT8 quantization for CPU inference.
+
+The two big Linear layers (`AdvancedDecoder`'s 512*6*6 -> 1024 projection and
+`AdvancedDiscriminator`'s 512*6*6 -> 1 head) dominate the memory footprint of
+the decoder and discriminator. `dynamic` mode swaps those Linear layers for
+dynamically quantized INT8 kernels; `static` mode additionally quantizes the
+convolutions with FX graph mode using calibration images.
+
+Enable at startup with QUANTIZE_MODELS=dynamic|static (QUANTIZE_CALIBRATION_DIR
+is required for static). Check accuracy against the fp32 models with:
+
+    python -m models.quantization --images path/to/validation/images --mode dynamic
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import time
+
+import torch
+import torch.nn as nn
+
+from preprocessing import list_images, open_model_image, image_to_array, to_model_batch
+
+QUANTIZE_MODE = os.getenv('QUANTIZE_MODELS', 'none').lower()
+CALIBRATION_DIR = os.getenv('QUANTIZE_CALIBRATION_DIR')
+
+
+def load_image_batches(image_dir, batch_size=16, limit=256):
+    """Load up to `limit` images from a directory as normalized 96x96 batches"""
+    arrays = [image_to_array(open_model_image(path)) for path in list_images(image_dir, limit)]
+    return [to_model_batch(arrays[i:i + batch_size]) for i in range(0, len(arrays), batch_size)]
+
+
+def quantize_dynamic(model):
+    """Return a copy of `model` with INT8 dynamically quantized Linear layers"""
+    return torch.ao.quantization.quantize_dynamic(copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(model, calibration_batches):
+    """Return a statically quantized (convs + linears) copy of `model` calibrated on the given batches"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(copy.deepcopy(model).eval(), qconfig_mapping, (calibration_batches[0],))
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def quantize_models(decoder, discriminator, mode, calibration_batches=None):
+    """Return (decoder, discriminator) quantized according to `mode` ('none', 'dynamic' or 'static')"""
+    if mode in ('', 'none', 'off'):
+        return decoder, discriminator
+    if mode == 'static':
+        if not calibration_batches:
+            raise ValueError('static quantization needs calibration images')
+        return quantize_static(decoder, calibration_batches), quantize_static(discriminator, calibration_batches)
+    if mode == 'dynamic':
+        return quantize_dynamic(decoder), quantize_dynamic(discriminator)
+    raise ValueError(f'Unknown quantization mode: {mode}')
+
+
+def planned_quantize_mode(device):
+    """The mode quantize_from_env will apply on `device`, unless quantization itself fails"""
+    if QUANTIZE_MODE in ('', 'none', 'off') or torch.device(device).type != 'cpu':
+        return 'none'
+    if QUANTIZE_MODE == 'static' and not (CALIBRATION_DIR and os.path.isdir(CALIBRATION_DIR)
+                                          and list_images(CALIBRATION_DIR, 1)):
+        return 'dynamic'
+    return QUANTIZE_MODE
+
+
+def quantize_from_env(decoder, discriminator):
+    """Apply the QUANTIZE_MODELS startup option.
+
+    Returns (decoder, discriminator, mode) where `mode` is the quantization
+    actually applied: static falls back to dynamic without calibration images,
+    and to `none` (fp32 models) on GPUs or on failure. Key anything derived
+    from the models by this mode, not by QUANTIZE_MODE.
+    """
+    if QUANTIZE_MODE in ('', 'none', 'off'):
+        return decoder, discriminator, 'none'
+    if next(decoder.parameters()).device.type != 'cpu':
+        print("[Startup] Quantization is CPU-only, serving fp32 models", flush=True)
+        return decoder, discriminator, 'none'
+    try:
+        mode = QUANTIZE_MODE
+        calibration = None
+        if mode == 'static':
+            if CALIBRATION_DIR and os.path.isdir(CALIBRATION_DIR):
+                calibration = load_image_batches(CALIBRATION_DIR)
+            if not calibration:
+                print("[Startup] QUANTIZE_CALIBRATION_DIR missing or empty, using dynamic quantization", flush=True)
+                mode = 'dynamic'
+        decoder, discriminator = quantize_models(decoder, discriminator, mode, calibration)
+        print(f"[Startup] Serving {mode} INT8 decoder and discriminator", flush=True)
+        return decoder, discriminator, mode
+    except Exception as e:
+        print(f"Warning: Quantization failed, serving fp32 models: {str(e)}", flush=True)
+        return decoder, discriminator, 'none'
+
+
+def model_size_bytes(model):
+    """Serialized size of a model's state dict"""
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell()
+
+
+def check_accuracy(generator, decoder, discriminator, q_decoder, q_discriminator, batches, message_len=256):
+    """Compare quantized decoder/discriminator against the fp32 models.
+
+    Embeds random messages into every validation image and reports the BER of
+    both decoders, their bit agreement, and how often the two discriminators
+    reach the same cover/stego verdict on covers and stegos.
+    """
+    bits = errors_fp32 = errors_q = bit_disagree = 0
+    verdicts = verdict_agree = 0
+    prob_diff = 0.0
+    time_fp32 = time_q = 0.0
+    with torch.no_grad():
+        for images in batches:
+            messages = torch.randint(0, 2, (images.size(0), message_len)).float()
+            stego = generator(images, messages)
+
+            start = time.perf_counter()
+            decoded_fp32 = decoder(stego) > 0.5
+            probs_fp32 = torch.sigmoid(discriminator(torch.cat([images, stego])))
+            time_fp32 += time.perf_counter() - start
+
+            start = time.perf_counter()
+            decoded_q = q_decoder(stego) > 0.5
+            probs_q = torch.sigmoid(q_discriminator(torch.cat([images, stego])))
+            time_q += time.perf_counter() - start
+
+            bits += messages.numel()
+            errors_fp32 += (decoded_fp32 != messages.bool()).sum().item()
+            errors_q += (decoded_q != messages.bool()).sum().item()
+            bit_disagree += (decoded_fp32 != decoded_q).sum().item()
+            verdicts += probs_fp32.numel()
+            verdict_agree += ((probs_fp32 < 0.5) == (probs_q < 0.5)).sum().item()
+            prob_diff = max(prob_diff, (probs_fp32 - probs_q).abs().max().item())
+
+    return {
+        'images': sum(b.size(0) for b in batches),
+        'ber_fp32': round(errors_fp32 / bits, 6) if bits else 0.0,
+        'ber_quantized': round(errors_q / bits, 6) if bits else 0.0,
+        'bit_agreement': round(1 - bit_disagree / bits, 6) if bits else 1.0,
+        'detection_agreement': round(verdict_agree / verdicts, 6) if verdicts else 1.0,
+        'max_probability_diff': round(prob_diff, 6),
+        'decoder_bytes': {'fp32': model_size_bytes(decoder), 'quantized': model_size_bytes(q_decoder)},
+        'discriminator_bytes': {'fp32': model_size_bytes(discriminator), 'quantized': model_size_bytes(q_discriminator)},
+        'seconds': {'fp32': round(time_fp32, 4), 'quantized': round(time_q, 4)}
+    }
+
+
+def main():
+    from models.loader import load_models
+
+    parser = argparse.ArgumentParser(description='Check INT8 decoder/discriminator accuracy against fp32')
+    parser.add_argument('--images', required=True, help='directory of validation images')
+    parser.add_argument('--mode', default='dynamic', choices=['dynamic', 'static'])
+    parser.add_argument('--calibration', help='directory of calibration images (static mode, defaults to --images)')
+    parser.add_argument('--limit', type=int, default=256)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    generator, decoder, discriminator = load_models(torch.device('cpu'))
+    batches = load_image_batches(args.images, limit=args.limit)
+    calibration = load_image_batches(args.calibration or args.images, limit=args.limit) if args.mode == 'static' else None
+    q_decoder, q_discriminator = quantize_models(decoder, discriminator, args.mode, calibration)
+    report = check_accuracy(generator, decoder, discriminator, q_decoder, q_discriminator, batches)
+    report['mode'] = args.mode
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Image loading for model input.
+
+The models only ever see 96x96 images, but phone photos are often 12+
+megapixels. Decoding those at full resolution and converting to RGB before the
+resize wastes most of the CPU time and memory of a request. `open_model_image`
+lets the JPEG decoder downscale during decode (draft mode) and shrinks other
+formats with `Image.reduce` before converting, so only a small image is ever
+materialised in RGB. Paths that really need the full image (saving the cover)
+keep using `Image.open(...).convert('RGB')`.
+
+Model input is kept as (96, 96, 3) uint8 arrays until a batch is formed;
+`to_model_batch` then casts every array straight into its slot of a
+preallocated float tensor and normalizes the whole batch in one op.
+`from_model_batch` is the inverse for generator output.
+"""
+import os
+import threading
+
+import numpy as np
+import torch
+from PIL import Image
+
+from archives import is_image_name
+
+MODEL_SIZE = 96
+
+# Modes Image.reduce can work on directly; anything else (e.g. palette) is converted first
+_REDUCIBLE_MODES = {'L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'YCbCr', 'I', 'F'}
+
+
+def open_model_image(source, size=MODEL_SIZE):
+    """Open an image for model input at the smallest resolution that still covers `size`x`size`"""
+    image = Image.open(source)
+    if image.format == 'JPEG':
+        # DCT-domain scaling (1/2, 1/4, 1/8); keeps the result >= the requested size
+        image.draft('RGB', (size, size))
+    return reduce_for_model(image, size)
+
+
+def reduce_for_model(image, size=MODEL_SIZE):
+    """Shrink an already opened image by an integer factor (box filter) and convert to RGB"""
+    if image.mode not in _REDUCIBLE_MODES:
+        image = image.convert('RGB')
+    factor = min(image.width // size, image.height // size)
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.convert('RGB')
+
+
+def image_to_array(image, size=MODEL_SIZE):
+    """Resize an RGB PIL image to `size`x`size` and return it as an (H, W, 3) uint8 array"""
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.BILINEAR)
+    return np.array(image, dtype=np.uint8)
+
+
+def list_images(directory, limit=None):
+    """Sorted paths of the image files in `directory` (see `archives.is_image_name`), at most `limit`"""
+    names = sorted(n for n in os.listdir(directory) if is_image_name(n))
+    return [os.path.join(directory, n) for n in names[:limit]]
+
+
+_buffers = threading.local()
+
+
+def batch_buffer(n, size=MODEL_SIZE, device='cpu'):
+    """Reusable (n, 3, size, size) float tensor owned by the calling thread.
+
+    The contents are overwritten by the next call on the same thread, so only
+    use it for inputs that do not outlive a single forward pass.
+    """
+    device = torch.device(device)
+    buf = getattr(_buffers, 'tensor', None)
+    if buf is None or buf.size(0) < n or buf.size(2) != size or buf.device != device:
+        buf = torch.empty((n, 3, size, size), dtype=torch.float32, device=device)
+        _buffers.tensor = buf
+    return buf[:n]
+
+
+def to_model_batch(arrays, device='cpu', out=None):
+    """Stack (H, W, 3) uint8 arrays into a normalized (N, 3, H, W) float tensor in [-1, 1]"""
+    h, w = arrays[0].shape[:2]
+    if out is None:
+        out = torch.empty((len(arrays), 3, h, w), dtype=torch.float32, device=device)
+    for slot, array in zip(out, arrays):
+        # torch.from_numpy shares memory; copy_ does the cast and the HWC -> CHW move in one pass
+        slot.copy_(torch.from_numpy(np.ascontiguousarray(array)).permute(2, 0, 1))
+    # Same as ToTensor() + Normalize(0.5, 0.5): x / 255 * 2 - 1
+    return out.mul_(1 / 127.5).sub_(1.0)
+
+
+def from_model_batch(tensor):
+    """Inverse of to_model_batch: (N, 3, H, W) tensor in [-1, 1] -> (N, H, W, 3) uint8 array"""
+    pixels = ((tensor.detach() + 1) * 127.5).clamp_(0, 255).to(torch.uint8)
+    return pixels.permute(0, 2, 3, 1).contiguous().cpu().numpy()
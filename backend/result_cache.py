@@ -0,0 +1,130 @@
+"""
+Cache of hide/extract/analyze responses for repeated inputs.
+
+In eval mode the models are deterministic, so the same upload (and message)
+always produces the same response. Clients re-submit identical inputs all the
+time, e.g. the frontend posts a freshly made stego image straight back to
+/steganography/extract. Responses are cached under a key built from the
+operation, the sha256 of the upload, the request parameters and the model
+version, so a hit skips decoding, inference and metrics entirely.
+
+The in-memory tier is an LRU of RESULT_CACHE_SIZE entries. Setting
+RESULT_CACHE_DIR adds a JSON-file tier that survives restarts. It is keyed per
+model version, so switching checkpoints, backends or quantization never serves
+stale results, and an old version's directory can simply be deleted.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR')
+
+
+def model_version(ckpt_hash, backend='eager', variant='none'):
+    """Version string for cache keys. Without a checkpoint the weights are random
+    per process, so the version is unique to this process."""
+    weights = ckpt_hash or f'random-{uuid.uuid4().hex}'
+    return f'{weights[:16]}-{backend}-{variant}'
+
+
+class ResultCache:
+    """Bounded LRU of JSON-serializable responses with an optional on-disk tier"""
+
+    def __init__(self, version, max_size=RESULT_CACHE_SIZE, cache_dir=RESULT_CACHE_DIR):
+        self.version = version
+        self.max_size = max(0, int(max_size))
+        self.cache_dir = os.path.join(cache_dir, version) if cache_dir else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, operation, data, *params):
+        """Cache key for an operation on upload bytes `data` with extra request parameters"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.version, operation, *params]).encode('utf-8'))
+        digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Cached response for `key`, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self._read(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        self._write(key, value)
+
+    def discard(self, key):
+        """Drop an entry whose response is no longer valid (e.g. its images were deleted)"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.cache_dir:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'disk': self.cache_dir is not None,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+    def _remember(self, key, value):
+        if not self.max_size:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def _read(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, value):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write result cache entry: {str(e)}", flush=True)
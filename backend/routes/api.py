@@ -1,6 +1,7 @@
-﻿from flask import Blueprint, request, jsonify, send_from_directory
+﻿from flask import Blueprint, request, jsonify, send_from_directory, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from db_models import db, ProcessingHistory, Favorite, UserPreference, ApiKey, User
+from image_pool import OUTPUT_FORMAT, OUTPUT_FORMATS
 from datetime import datetime
 import secrets
 import os
@@ -51,8 +52,13 @@ def delete_history(history_id):
     h = ProcessingHistory.query.filter_by(id=history_id, user_id=user_id_int).first()
     if not h:
         return jsonify({'error': 'Not found'}), 404
+    paths = [h.image_path, h.cover_path]
     db.session.delete(h)
     db.session.commit()
+    # Delete stored images no other history entry points at
+    store = current_app.extensions.get('content_store')
+    if store is not None:
+        store.release(paths)
     return jsonify({'message': 'Deleted'}), 200
 
 @api.route('/favorites', methods=['GET', 'POST'])
@@ -83,16 +89,21 @@ def manage_preferences():
     pref = UserPreference.query.filter_by(user_id=user_id_int).first()
     if request.method == 'GET':
         if not pref:
-            return jsonify({'theme': 'light', 'notifications': True})
-        return jsonify({'theme': pref.theme, 'notifications': pref.notifications})
+            return jsonify({'theme': 'light', 'notifications': True, 'preferred_image_format': OUTPUT_FORMAT})
+        return jsonify({'theme': pref.theme, 'notifications': pref.notifications_enabled,
+                        'preferred_image_format': pref.preferred_image_format or OUTPUT_FORMAT})
     data = request.get_json() or {}
+    if 'preferred_image_format' in data and str(data['preferred_image_format']).lower() not in OUTPUT_FORMATS:
+        return jsonify({'error': f"preferred_image_format must be one of {', '.join(OUTPUT_FORMATS)}"}), 400
     if not pref:
         pref = UserPreference(user_id=user_id_int)
         db.session.add(pref)
     if 'theme' in data:
         pref.theme = data['theme']
     if 'notifications' in data:
-        pref.notifications = data['notifications']
+        pref.notifications_enabled = data['notifications']
+    if 'preferred_image_format' in data:
+        pref.preferred_image_format = str(data['preferred_image_format']).lower()
     db.session.commit()
     return jsonify({'message': 'Preferences updated'})
 
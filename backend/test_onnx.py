@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+import torch
+from models.loader import load_models
+from models.onnx_backend import ONNX_PARITY_ATOL, OnnxModel, export_onnx, check_parity
+
+# ONNX Runtime outputs must match PyTorch for single images and batches (dynamic batch axis)
+try:
+    import onnxruntime  # noqa: F401
+except ImportError:
+    print("onnxruntime is not installed, skipping")
+    sys.exit(0)
+
+device = torch.device('cpu')
+torch.manual_seed(0)
+
+print("Loading eval models...")
+generator, decoder, discriminator = load_models(device)
+message_len = generator.msg_proj.in_features
+
+failures = 0
+with tempfile.TemporaryDirectory() as tmp:
+    for name, model in (('generator', generator), ('decoder', decoder), ('discriminator', discriminator)):
+        path = os.path.join(tmp, f'{name}.onnx')
+        export_onnx(name, model, path, message_len)
+        onnx_model = OnnxModel(path)
+        for batch_size in (1, 4):
+            diff = check_parity(name, model, onnx_model, batch_size=batch_size, message_len=message_len)
+            ok = diff <= ONNX_PARITY_ATOL
+            failures += not ok
+            print(f"{name} batch {batch_size}: max abs diff {diff:.2e} -> {'OK' if ok else 'MISMATCH'}")
+
+sys.exit(1 if failures else 0)
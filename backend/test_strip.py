@@ -0,0 +1,36 @@
+import sys
+import torch
+from models.loader import load_models, strip_model, strip_models
+
+# Stripping (spectral norm baked into the weights, dropout removed) must not change outputs
+ATOL = 1e-5
+device = torch.device('cpu')
+torch.manual_seed(0)
+
+print("Loading eval models without stripping...")
+generator, decoder, discriminator = load_models(device, strip=False)
+
+failures = 0
+images = torch.rand(8, 3, 96, 96) * 2 - 1
+with torch.no_grad():
+    stego = generator(images, torch.randint(0, 2, (8, 256)).float())
+for name, model in (('decoder', decoder), ('discriminator', discriminator)):
+    stripped, probe_diff = strip_model(model, device)
+    with torch.no_grad():
+        diff = max((stripped(batch) - model(batch)).abs().max().item() for batch in (images, stego))
+    ok = probe_diff <= ATOL and diff <= ATOL
+    failures += not ok
+    print(f"{name}: probe diff {probe_diff:.2e}, cover/stego diff {diff:.2e} -> {'OK' if ok else 'MISMATCH'}")
+
+# A stripped model that does not match is never swapped in
+kept_decoder, kept_discriminator = strip_models(decoder, discriminator, device, atol=-1)
+ok = kept_decoder is decoder and kept_discriminator is discriminator
+failures += not ok
+print(f"mismatch keeps eval models: {'OK' if ok else 'FAILED'}")
+
+swapped_decoder, swapped_discriminator = strip_models(decoder, discriminator, device)
+ok = swapped_decoder is not decoder and swapped_discriminator is not discriminator
+failures += not ok
+print(f"match swaps in stripped models: {'OK' if ok else 'FAILED'}")
+
+sys.exit(1 if failures else 0)
@@ -0,0 +1,156 @@
+"""
+Write-behind persistence for saved images.
+
+Encoding a full-resolution cover and writing it to `instance/uploads`
+can take hundreds of milliseconds, and the hide endpoint used to wait for both
+the cover and the stego image before responding. A WriteBehindStore hands the
+encode to the image pool and the disk write to a background writer thread, so
+requests return as soon as the file name is known. Until a file is on disk,
+`/uploads/<filename>` is served from the encoded bytes kept in memory.
+
+Memory is bounded: once UPLOAD_BUFFER_MB of images are waiting to be written,
+new saves block until earlier writes finish.
+"""
+import os
+import queue
+import threading
+import time
+
+from image_pool import OUTPUT_FORMAT, encode_image, encode_upload
+
+UPLOAD_BUFFER_MB = float(os.getenv('UPLOAD_BUFFER_MB', '256'))
+
+
+class _Pending:
+    __slots__ = ('size', 'data', 'encoded')
+
+    def __init__(self, size):
+        self.size = size
+        self.data = None
+        self.encoded = threading.Event()
+
+
+class WriteBehindStore:
+    """Persist encoded images into `directory` off the request path"""
+
+    def __init__(self, directory, pool, max_buffer_mb=UPLOAD_BUFFER_MB):
+        self.directory = directory
+        self.pool = pool
+        self.max_buffer_bytes = int(max_buffer_mb * 1024 * 1024)
+        self._pending = {}
+        self._buffered = 0
+        self._cond = threading.Condition()
+        self._writes = queue.Queue()
+        self._written = 0
+        self._failed = 0
+        self._blocked = 0.0
+        self._writer = threading.Thread(target=self._run, name='upload-writer', daemon=True)
+        self._writer.start()
+
+    def save_image(self, array, filename, fmt=OUTPUT_FORMAT):
+        """Queue a uint8 HxWx3 array to be encoded in `fmt` and written as `filename`"""
+        self._put(filename, array.nbytes, encode_image, array, fmt)
+        return filename
+
+    def save_upload(self, data, filename, fmt=OUTPUT_FORMAT):
+        """Queue uploaded image bytes to be written as a full-resolution RGB image in `fmt`"""
+        self._put(filename, len(data), encode_upload, data, fmt)
+        return filename
+
+    def contains(self, filename):
+        """True while `filename` is queued and not yet on disk"""
+        with self._cond:
+            return filename in self._pending
+
+    def get(self, filename, timeout=None):
+        """PNG bytes of a file not yet on disk, or None if it was written (or never queued)"""
+        with self._cond:
+            entry = self._pending.get(filename)
+        if entry is None:
+            return None
+        entry.encoded.wait(timeout)
+        return entry.data
+
+    def flush(self, timeout=None):
+        """Wait until every queued file has been written; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def flush_name(self, filename, timeout=None):
+        """Wait until one queued file has been written (or failed)"""
+        with self._cond:
+            return self._cond.wait_for(lambda: filename not in self._pending, timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'buffered_bytes': self._buffered,
+                'max_buffer_bytes': self.max_buffer_bytes,
+                'written': self._written,
+                'failed': self._failed,
+                'blocked_ms': round(self._blocked * 1000, 3)
+            }
+
+    def _put(self, filename, size, fn, *args):
+        entry = _Pending(size)
+        with self._cond:
+            # Back-pressure: wait for earlier writes while the buffer is full
+            # (a single oversized image is still accepted once the buffer is empty)
+            started = time.perf_counter()
+            while self._buffered and self._buffered + size > self.max_buffer_bytes:
+                self._cond.wait()
+            self._blocked += time.perf_counter() - started
+            self._buffered += size
+            self._pending[filename] = entry
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self._encoded(filename, entry, f))
+
+    def _encoded(self, filename, entry, future):
+        try:
+            data = future.result()
+        except Exception as e:
+            print(f"Warning: Could not encode {filename}: {str(e)}", flush=True)
+            self._finish(filename, entry, failed=True)
+            return
+        with self._cond:
+            # The encoded PNG replaces the raw input in the buffer
+            self._buffered += len(data) - entry.size
+            entry.size = len(data)
+            entry.data = data
+        entry.encoded.set()
+        self._writes.put((filename, entry))
+
+    def _run(self):
+        while True:
+            filename, entry = self._writes.get()
+            path = os.path.join(self.directory, filename)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    f.write(entry.data)
+                os.replace(tmp_path, path)
+                failed = False
+            except OSError as e:
+                print(f"Warning: Could not write {path}: {str(e)}", flush=True)
+                failed = True
+            self._finish(filename, entry, failed)
+
+    def _finish(self, filename, entry, failed):
+        with self._cond:
+            if self._pending.get(filename) is entry:
+                del self._pending[filename]
+            self._buffered -= entry.size
+            if failed:
+                self._failed += 1
+            else:
+                self._written += 1
+            self._cond.notify_all()
+        entry.encoded.set()
@@ -160,7 +160,8 @@ function Settings() {
                 label="Preferred Image Format"
               >
                 <MenuItem value="png">PNG</MenuItem>
-                <MenuItem value="jpg">JPG</MenuItem>
+                <MenuItem value="png-fast">PNG (fast)</MenuItem>
+                <MenuItem value="webp">WebP (lossless)</MenuItem>
               </Select>
             </FormControl>
           </Grid>
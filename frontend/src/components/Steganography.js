@@ -76,6 +76,8 @@ function Steganography() {
       const formData = new FormData();
       formData.append('image', coverImage);
       formData.append('message', message);
+      // Ask the backend to decode the saved stego image so we don't have to re-upload it
+      formData.append('verify', 'true');
 
       const response = await axios.post(
         'http://127.0.0.1:5000/steganography/hide',
@@ -134,39 +136,22 @@ function Steganography() {
             // Use real backend metrics directly (PSNR, SSIM, BER calculated by backend)
             setStegoMetrics(backendStegoMetrics);
 
-            // Now fetch the stego image blob and send to extractor endpoint to compute character accuracy & BER
-            try {
-              console.log('Fetching stego image for metric extraction:', stegoUrl);
-              const imgResp = await fetch(stegoUrl);
-              const blob = await imgResp.blob();
+            // Round-trip check done by the backend on the saved stego PNG (verify=true)
+            const extractedMessage = response.data.verification?.message || '';
+            const ber = computeBer(message, extractedMessage);
+            const charAccuracy = 1 - ber; // Character accuracy = 100% - BER
 
-              const extractForm = new FormData();
-              extractForm.append('image', blob, 'stego_image.png');
-
-              const extractResp = await axios.post('http://127.0.0.1:5000/steganography/extract', extractForm, {
-                headers: { 'Content-Type': 'multipart/form-data' }
-              });
-
-              console.log('Extractor response:', extractResp.data);
-              const extractedMessage = extractResp.data?.message || '';
-
-              const ber = computeBer(message, extractedMessage);
-              const charAccuracy = 1 - ber; // Character accuracy = 100% - BER
-
-              // Update stego metrics with computed accuracy and ber
-              const finalStegoMetrics = {
-                ...interimStegoMetrics,
-                ber: ber
-              };
-              setStegoMetrics(finalStegoMetrics);
+            // Update stego metrics with computed accuracy and ber
+            const finalStegoMetrics = {
+              ...backendStegoMetrics,
+              ber: ber
+            };
+            setStegoMetrics(finalStegoMetrics);
 
-              // Update stego stats or modelPerformance with accuracy information if desired
-              setStegoStats({ character_accuracy: charAccuracy, extracted_message: extractedMessage });
+            // Update stego stats or modelPerformance with accuracy information if desired
+            setStegoStats({ character_accuracy: charAccuracy, extracted_message: extractedMessage });
 
-              console.log('Final stego metrics:', finalStegoMetrics, 'character_accuracy:', charAccuracy);
-            } catch (err) {
-              console.warn('Failed to compute accuracy/BER from extractor:', err);
-            }
+            console.log('Final stego metrics:', finalStegoMetrics, 'character_accuracy:', charAccuracy);
 
             setSuccess('Message hidden successfully!');
           }